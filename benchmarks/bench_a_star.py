@@ -0,0 +1,87 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from sspace import OccupancyMap, StateSpaceGrid
+import planner
+
+# Compares the heap-based open set of planner.AStar with the linear scan
+# it replaced, on the 800x600 map used by the GUI at several resolutions.
+# The compiled column runs AStar over a StateSpaceGrid with compiled=True.
+# Run from the repository root with:
+#   python -m benchmarks.bench_a_star
+
+class LinearScanAStar(planner.AStar):
+    # Reproduces the old open set: an unsorted list, scanned for the
+    # lowest f on every expansion and removed from with list.pop(i)
+
+    def push_open(self, node, f):
+        self.open_set.append((f, node))
+
+    def pop_open(self):
+        while self.open_set:
+            best_i = min(range(len(self.open_set)),
+                key=lambda i: self.open_set[i][0])
+            _, node = self.open_set.pop(best_i)
+            if self.sspace.get_variable("checked", node) != planner._a_star.CLOSED:
+                return node
+        return None
+
+def make_map(width, height, resolution, seed, obstacles):
+    occ_map = OccupancyMap(width, height, resolution)
+    rng = random.Random(seed)
+    r = max(1, int(20/resolution))
+    for _ in range(obstacles):
+        x = rng.randrange(occ_map.width)
+        y = rng.randrange(occ_map.height)
+        occ_map.set_circle(x, y, r, True)
+    # Keep the corners free for the start and goal
+    occ_map.set_circle(0, 0, r, False)
+    occ_map.set_circle(occ_map.width-1, occ_map.height-1, r, False)
+    return occ_map
+
+def run(planner_type, occ_map, compiled=False):
+    sspace = StateSpaceGrid(occ_map, compiled)
+    p = planner_type(sspace)
+    start = np.array([0, 0])
+    goal = np.array([occ_map.width-1, occ_map.height-1])
+    t = time.perf_counter()
+    p.start(start, goal)
+    while p.active:
+        p.update()
+    return time.perf_counter() - t, p.num_iter, p.complete
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resolutions", type=int, nargs="+", default=[5, 2, 1])
+    parser.add_argument("--obstacles", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    # The default covers the full 800x600 grid (resolution 1), the size
+    # the comparison is for, although the linear scan takes minutes there
+    parser.add_argument("--max-linear-cells", type=int, default=500000,
+        help="skip the linear scan on larger grids")
+    args = parser.parse_args()
+
+    print("{:>10} {:>8} {:>12} {:>12} {:>8} {:>14}".format(
+        "grid", "expanded", "heap (s)", "linear (s)", "speedup", "compiled (s)"))
+    for resolution in args.resolutions:
+        occ_map = make_map(800, 600, resolution, args.seed, args.obstacles)
+        grid = "{}x{}".format(occ_map.width, occ_map.height)
+        heap_time, num_iter, complete = run(planner.AStar, occ_map)
+        if not complete:
+            print("{:>10} no solution".format(grid))
+            continue
+        compiled_time, _, _ = run(planner.AStar, occ_map, compiled=True)
+        if occ_map.width*occ_map.height <= args.max_linear_cells:
+            linear_time, _, _ = run(LinearScanAStar, occ_map)
+            print("{:>10} {:>8} {:>12.3f} {:>12.3f} {:>7.1f}x {:>14.3f}".format(
+                grid, num_iter, heap_time, linear_time, linear_time/heap_time,
+                compiled_time))
+        else:
+            print("{:>10} {:>8} {:>12.3f} {:>12} {:>8} {:>14.3f}".format(
+                grid, num_iter, heap_time, "skipped", "-", compiled_time))
+
+if __name__ == "__main__":
+    main()
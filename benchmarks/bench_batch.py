@@ -0,0 +1,44 @@
+import argparse
+import os
+import time
+
+import planner
+
+from .corpus import make_corpus
+
+# Times planner.solve_batch over many queries on one map, for several
+# process counts, against solving the queries one after another.
+# Throughput should grow close to linearly up to the number of cores.
+# Run from the repository root with:
+#   python -m benchmarks.bench_batch
+
+PLANNERS = {"astar": planner.AStar, "jps": planner.JPS}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--maps", nargs="+", default=["maze-800x600-c20"])
+    parser.add_argument("--planner", default="astar", choices=list(PLANNERS))
+    parser.add_argument("--processes", type=int, nargs="+",
+        default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    planner_type = PLANNERS[args.planner]
+    sspace_kwargs = {"compiled": True} if args.planner == "astar" else {}
+    print("{} cores".format(os.cpu_count()))
+    print("{:<20} {:>9} {:>10} {:>12} {:>8}".format(
+        "map", "processes", "time (s)", "queries/s", "speedup"))
+    for case in make_corpus(args.seed, args.queries, patterns=args.maps):
+        base = None
+        for processes in args.processes:
+            t = time.perf_counter()
+            results = dict(planner.solve_batch(case.occ_map, case.queries,
+                planner_type, processes, sspace_kwargs, seed=args.seed))
+            t = time.perf_counter() - t
+            base = base or t
+            print("{:<20} {:>9} {:>10.3f} {:>12.1f} {:>7.2f}x".format(
+                case.name, processes, t, len(results)/t, base/t))
+
+if __name__ == "__main__":
+    main()
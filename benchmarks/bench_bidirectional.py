@@ -0,0 +1,44 @@
+import argparse
+
+from . import suite
+from .corpus import make_corpus
+
+# Compares BidirectionalAStar with AStar on the maze maps of the benchmark
+# corpus, whose first query runs between opposite corners. Both must find
+# paths of the same cost. Bidirectional search should expand far fewer
+# cells on long queries through mazes with loops (braid-*). In mazes with
+# a single route between any two cells, the searches can't cut corners
+# and it expands about as many as AStar.
+# Run from the repository root with:
+#   python -m benchmarks.bench_bidirectional
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--maps", nargs="+", default=["maze-800x600-*", "braid-*"])
+    parser.add_argument("--queries", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    cases = make_corpus(args.seed, args.queries, patterns=args.maps)
+    records = suite.run(["astar", "bidir"], cases, args.seed, memory=False)
+
+    # Check both planners found paths of the same cost
+    results = {}
+    for r in records:
+        results.setdefault((r["map"], r["query"]), {})[r["planner"]] = r
+    print()
+    print("{:<20} {:>3} {:>10} {:>12} {:>12} {:>8}".format(
+        "map", "", "cost", "astar", "bidir", "ratio"))
+    for (map_name, query), r in results.items():
+        astar, bidir = r["astar"], r["bidir"]
+        if astar["success"] != bidir["success"] or (astar["success"] and
+           abs(astar["cost"] - bidir["cost"]) > 1e-3):
+            print("Result differs on {} query {}".format(map_name, query))
+            continue
+        cost = "{:.1f}".format(astar["cost"]) if astar["success"] else "-"
+        print("{:<20} {:>3} {:>10} {:>12} {:>12} {:>7.2f}x".format(
+            map_name, query, cost, astar["num_iter"], bidir["num_iter"],
+            astar["num_iter"]/max(bidir["num_iter"], 1)))
+
+if __name__ == "__main__":
+    main()
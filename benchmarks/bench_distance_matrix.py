@@ -0,0 +1,51 @@
+import argparse
+import time
+
+import numpy as np
+
+from sspace import StateSpaceGrid
+import planner
+
+from .corpus import make_corpus
+
+# Times distance_matrix over random free waypoints on the benchmark corpus
+# for several process counts, against one AStar query per pair on a
+# sample of the pairs.
+# Run from the repository root with:
+#   python -m benchmarks.bench_distance_matrix --points 100
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--maps", nargs="+", default=["maze-800x600-c10"])
+    parser.add_argument("--points", type=int, default=50)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--pairs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for case in make_corpus(args.seed, 0, patterns=args.maps):
+        free = np.argwhere(case.occ_map.occ_map == 0)
+        points = free[rng.choice(len(free), args.points, replace=False)]
+        for processes in args.processes:
+            sspace = StateSpaceGrid(case.occ_map, compiled=True)
+            t = time.perf_counter()
+            matrix = planner.distance_matrix(sspace, points, processes,
+                cache=planner.DistanceMatrixCache())
+            t = time.perf_counter() - t
+            print("{:<20} {:>4} points {:>2} processes {:>8.2f}s".format(
+                case.name, args.points, processes, t))
+
+        # Estimate the time for every pair by AStar from a sample of them
+        pairs = rng.integers(len(points), size=(args.pairs, 2))
+        t = time.perf_counter()
+        for i, j in pairs:
+            result = planner.solve(sspace, points[i], points[j])
+            if i != j and abs(result.cost - matrix[i, j]) > 1e-6:
+                print("Cost differs for pair {} {}".format(i, j))
+        t = (time.perf_counter() - t)/args.pairs
+        print("{:<20} AStar per pair {:.3f}s, {:.1f}s for all pairs".format(
+            case.name, t, t*args.points*(args.points - 1)))
+
+if __name__ == "__main__":
+    main()
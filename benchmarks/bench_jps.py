@@ -0,0 +1,37 @@
+import argparse
+
+from . import suite
+from .corpus import make_corpus
+
+# Compares JPS with AStar on the open and maze maps of the benchmark
+# corpus. JPS should find paths of the same cost with far fewer
+# expansions, since only jump points go on the open set.
+# Run from the repository root with:
+#   python -m benchmarks.bench_jps
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--maps", nargs="+", default=["empty-*", "maze-*"])
+    parser.add_argument("--queries", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    cases = make_corpus(args.seed, args.queries, patterns=args.maps)
+    records = suite.run(["astar", "jps"], cases, args.seed, memory=False)
+
+    # Check both planners found paths of the same cost
+    costs = {}
+    for r in records:
+        costs.setdefault((r["map"], r["query"]), {})[r["planner"]] = r["cost"]
+    for (map_name, query), c in costs.items():
+        if c["astar"] is None or c["jps"] is None:
+            if c["astar"] != c["jps"]:
+                print("Success differs on {} query {}".format(map_name, query))
+        elif abs(c["astar"] - c["jps"]) > 1e-6:
+            print("Cost differs on {} query {}: {:.3f} vs {:.3f}".format(
+                map_name, query, c["astar"], c["jps"]))
+
+    suite.print_summary(suite.summarise(records))
+
+if __name__ == "__main__":
+    main()
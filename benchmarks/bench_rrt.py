@@ -0,0 +1,43 @@
+import argparse
+import time
+
+import numpy as np
+
+from sspace import StateSpaceGrid
+import planner
+
+from .corpus import make_corpus
+
+# Times RRT tree growth per accepted vertex for several batch sizes.
+# A batch size of 1 is the original one sample per update.
+# Run from the repository root with:
+#   python -m benchmarks.bench_rrt
+
+def grow(occ_map, start, goal, batch_size, K, seed):
+    np.random.seed(seed)
+    p = planner.RRT(StateSpaceGrid(occ_map), K, 5, batch_size=batch_size)
+    t = time.perf_counter()
+    p.start(start, goal)
+    while p.active:
+        p.update()
+    return time.perf_counter() - t, p.k, p.complete
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--maps", nargs="+", default=["random-800x600", "maze-800x600-c20"])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 64, 256])
+    parser.add_argument("--K", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("{:<20} {:>6} {:>9} {:>10} {:>14}".format(
+        "map", "batch", "vertices", "time (s)", "us per vertex"))
+    for case in make_corpus(args.seed, 1, patterns=args.maps):
+        start, goal = case.queries[0]
+        for batch_size in args.batch_sizes:
+            t, k, _ = grow(case.occ_map, start, goal, batch_size, args.K, args.seed)
+            print("{:<20} {:>6} {:>9} {:>10.3f} {:>14.1f}".format(
+                case.name, batch_size, k, t, 1e6*t/k))
+
+if __name__ == "__main__":
+    main()
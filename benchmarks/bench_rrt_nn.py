@@ -0,0 +1,61 @@
+import argparse
+import time
+
+import numpy as np
+
+import planner
+
+# Times growing a tree of K vertices, where each new vertex first queries
+# the nearest existing one, as RRT does. Compares the nearest neighbour
+# indexes with the python loop RRT used before.
+# Run from the repository root with:
+#   python -m benchmarks.bench_rrt_nn
+
+class PythonLoopIndex(planner.LinearIndex):
+    # Reproduces the old RRT.nearest_vertex, one distance call per vertex
+    def nearest(self, state):
+        closest = 0
+        smallest_dist = np.hypot(*(self.states[0] - state))
+        for i in range(1, self.size):
+            dist = np.hypot(*(self.states[i] - state))
+            if dist < smallest_dist:
+                smallest_dist = dist
+                closest = i
+        return closest
+
+def grow(index_type, states):
+    index = index_type(states.shape[1])
+    t = time.perf_counter()
+    index.insert(states[0])
+    for state in states[1:]:
+        index.nearest(state)
+        index.insert(state)
+    return time.perf_counter() - t
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-loop", type=int, default=10000,
+        help="skip the python loop above this K, where it takes hours")
+    args = parser.parse_args()
+
+    indexes = [
+        ("python loop", PythonLoopIndex),
+        ("linear", planner.LinearIndex),
+        ("kd-tree", planner.KDTreeIndex)]
+
+    rng = np.random.default_rng(args.seed)
+    print("{:>8}".format("K") + "".join("{:>14}".format(name) for name, _ in indexes))
+    for K in args.sizes:
+        states = rng.integers(0, [800, 600], size=(K, 2)).astype(float)
+        row = "{:>8}".format(K)
+        for name, index_type in indexes:
+            if index_type is PythonLoopIndex and K > args.max_loop:
+                row += "{:>14}".format("skipped")
+                continue
+            row += "{:>13.3f}s".format(grow(index_type, states))
+        print(row)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import argparse
+
+import numpy as np
+
+from sspace import StateSpaceGrid
+import planner
+
+from .corpus import make_corpus
+
+# Reports path length and waypoint count before and after smooth_path for
+# grid (AStar), sampling (RRT) and any-angle (ThetaStar) planners on the
+# benchmark corpus, with the time taken including smoothing.
+# Run from the repository root with:
+#   python -m benchmarks.bench_smoothing
+
+PLANNERS = {
+    "astar": (planner.AStar, {}),
+    "theta": (planner.ThetaStar, {}),
+    "rrt": (planner.RRT, {"K": 10000, "delta_q": 5}),
+}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--maps", nargs="+", default=["random-*", "maze-800x600-*"])
+    parser.add_argument("--planners", nargs="+", default=list(PLANNERS))
+    parser.add_argument("--queries", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("{:<20} {:<6} {:>3} {:>10} {:>10} {:>10} {:>10} {:>9}".format(
+        "map", "", "", "length", "smoothed", "waypoints", "smoothed", "time"))
+    for case in make_corpus(args.seed, args.queries, patterns=args.maps):
+        sspace = StateSpaceGrid(case.occ_map, compiled=True)
+        for name in args.planners:
+            planner_type, kwargs = PLANNERS[name]
+            for i, (start, goal) in enumerate(case.queries):
+                np.random.seed(args.seed + i)
+                result = planner.solve(sspace, start, goal, planner_type,
+                    smooth=True, **kwargs)
+                if not result.success:
+                    print("{:<20} {:<6} {:>3} {:>10}".format(case.name, name, i, "-"))
+                    continue
+                print("{:<20} {:<6} {:>3} {:>10.1f} {:>10.1f} {:>10} {:>10} {:>8.3f}s".format(
+                    case.name, name, i, result.raw_length, result.length,
+                    result.raw_waypoints, result.waypoints, result.time))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import fnmatch
+
+import numpy as np
+
+from sspace import OccupancyMap, MazeGenerator
+
+# A reproducible corpus of maps for benchmarking planners.
+# Each map is built from a name and a seed, so the same corpus can be
+# regenerated on any machine. Maps are headless, with one cell per unit
+# (resolution 1), and each comes with a fixed set of start/goal queries.
+
+class MapCase:
+    def __init__(self, name, occ_map, queries):
+        self.name = name
+        self.occ_map = occ_map
+        self.queries = queries
+
+def empty_map(width, height):
+    return OccupancyMap(width, height, 1)
+
+def random_obstacle_map(width, height, density, seed, radius=4):
+    # Circles are added until roughly density of the area is covered,
+    # ignoring overlap
+    occ_map = OccupancyMap(width, height, 1)
+    rng = np.random.default_rng(seed)
+    count = int(density*width*height/(np.pi*radius**2))
+    xs = rng.integers(0, width, count)
+    ys = rng.integers(0, height, count)
+    for x, y in zip(xs, ys):
+        occ_map.set_circle(int(x), int(y), radius, True)
+    return occ_map
+
+def maze_map(width, height, cell_size, seed):
+    occ_map = OccupancyMap(width, height, 1)
+    MazeGenerator(occ_map, cell_size).generate(occ_map, seed)
+    return occ_map
+
+# A maze with loops. The generated maze has exactly one route between any
+# two cells, and then loops of the walls left between cells are opened.
+def braided_maze_map(width, height, cell_size, loops, seed):
+    occ_map = OccupancyMap(width, height, 1)
+    MazeGenerator(occ_map, cell_size).generate(occ_map, seed, loops=loops)
+    return occ_map
+
+# Picks start/goal pairs of free cells. The first query always joins the
+# free cells closest to opposite corners, giving one long query per map.
+def make_queries(occ_map, count, seed):
+    free = np.argwhere(~occ_map.occ_map)
+    if len(free) < 2:
+        return []
+    rng = np.random.default_rng(seed)
+    corner = np.array([occ_map.width-1, occ_map.height-1])
+    queries = [(
+        free[np.argmin(np.abs(free).sum(axis=1))],
+        free[np.argmin(np.abs(free - corner).sum(axis=1))])]
+    while len(queries) < count:
+        i, j = rng.choice(len(free), 2, replace=False)
+        queries.append((free[i], free[j]))
+    return queries
+
+# (name, function, arguments) for every map in the corpus
+MAPS = [
+    ("empty-160x120", empty_map, (160, 120)),
+    ("random-160x120", random_obstacle_map, (160, 120, 0.2)),
+    ("maze-160x120-c10", maze_map, (160, 120, 10)),
+    ("empty-800x600", empty_map, (800, 600)),
+    ("random-800x600", random_obstacle_map, (800, 600, 0.2)),
+    ("maze-800x600-c10", maze_map, (800, 600, 10)),
+    ("maze-800x600-c20", maze_map, (800, 600, 20)),
+    ("maze-800x600-c40", maze_map, (800, 600, 40)),
+    ("braid-800x600-c10", braided_maze_map, (800, 600, 10, 0.2)),
+]
+
+LARGE_MAPS = [
+    ("empty-4000x4000", empty_map, (4000, 4000)),
+    ("random-4000x4000", random_obstacle_map, (4000, 4000, 0.2)),
+    ("maze-4000x4000-c20", maze_map, (4000, 4000, 20)),
+]
+
+def make_map(function, args, seed):
+    if function is empty_map:
+        return function(*args)
+    return function(*args, seed)
+
+# Yields a MapCase for each map whose name matches one of the patterns
+def make_corpus(seed=0, num_queries=5, large=False, patterns=("*",)):
+    specs = MAPS + (LARGE_MAPS if large else [])
+    for i, (name, function, args) in enumerate(specs):
+        if not any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+            continue
+        occ_map = make_map(function, args, seed + i)
+        yield MapCase(name, occ_map, make_queries(occ_map, num_queries, seed + i))
@@ -0,0 +1,191 @@
+import argparse
+import contextlib
+import csv
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+from sspace import StateSpaceGrid
+import planner
+
+from .corpus import make_corpus
+
+# Runs planners over the benchmark corpus and records, for every query,
+# wall time, expansions, peak memory, path cost and success.
+# Results are written as JSON and/or CSV, and can be compared against the
+# JSON from an earlier version to spot regressions.
+# Run from the repository root with, eg:
+#   python -m benchmarks.suite --json results.json
+#   python -m benchmarks.suite --maps "maze-*" --compare results.json
+
+# name: (planner type, planner arguments, StateSpaceGrid arguments)
+PLANNERS = {
+    "astar": (planner.AStar, {}, {"compiled": True}),
+    "jps": (planner.JPS, {}, {}),
+    "bidir": (planner.BidirectionalAStar, {}, {"compiled": True}),
+    "theta": (planner.ThetaStar, {}, {"compiled": True}),
+    "hpa": (planner.HPAStar, {"cluster_size": 20}, {}),
+    "rrt": (planner.RRT, {"K": 10000, "delta_q": 5}, {}),
+    "rrt-batch": (planner.RRT, {"K": 10000, "delta_q": 5, "batch_size": 64}, {}),
+    "rrt-star": (planner.RRTStar, {"K": 50000, "delta_q": 5}, {}),
+}
+
+FIELDS = ["map", "planner", "query", "start", "goal", "success", "cost",
+    "num_iter", "time", "setup_time", "peak_memory"]
+
+def run_query(planner_name, occ_map, start, goal, seed, memory):
+    planner_type, kwargs, sspace_kwargs = PLANNERS[planner_name]
+    if memory:
+        tracemalloc.start()
+    # Seed the global generator used by StateSpaceGrid.random_node
+    np.random.seed(seed)
+    t = time.perf_counter()
+    sspace = StateSpaceGrid(occ_map, **sspace_kwargs)
+    setup_time = time.perf_counter() - t
+    result = planner.solve(sspace, start, goal, planner_type, **kwargs)
+    # Setup covers building the state space and the planner, eg: HPA*'s
+    # cluster graph, but not the search
+    setup_time += result.setup_time
+    peak_memory = None
+    if memory:
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, setup_time, peak_memory
+
+def run(planner_names, cases, seed=0, memory=True):
+    records = []
+    for case in cases:
+        for planner_name in planner_names:
+            for i, (start, goal) in enumerate(case.queries):
+                result, setup_time, _ = run_query(
+                    planner_name, case.occ_map, start, goal, seed + i, False)
+                peak_memory = None
+                if memory:
+                    # Tracing slows the search down, so measure memory on a
+                    # second run rather than the timed one
+                    _, _, peak_memory = run_query(
+                        planner_name, case.occ_map, start, goal, seed + i, True)
+                record = {
+                    "map": case.name,
+                    "planner": planner_name,
+                    "query": i,
+                    "start": [int(v) for v in start],
+                    "goal": [int(v) for v in goal],
+                    "success": result.success,
+                    "cost": result.cost if result.success else None,
+                    "num_iter": result.num_iter,
+                    "time": result.time,
+                    "setup_time": setup_time,
+                    "peak_memory": peak_memory,
+                }
+                records.append(record)
+                print_record(record)
+    return records
+
+def print_record(record):
+    cost = "{:.2f}".format(record["cost"]) if record["success"] else "-"
+    memory = "-"
+    if record["peak_memory"] is not None:
+        memory = "{:.1f}MB".format(record["peak_memory"]/1e6)
+    print("{:<20} {:<10} {:>3} {:>8} {:>10} {:>9.3f}s {:>9.3f}s {:>9}".format(
+        record["map"], record["planner"], record["query"],
+        cost, record["num_iter"], record["time"], record["setup_time"], memory))
+
+# Groups records by (map, planner), giving success rate, mean time, setup
+# time and expansions, and mean cost over the successful queries
+def summarise(records):
+    groups = {}
+    for record in records:
+        groups.setdefault((record["map"], record["planner"]), []).append(record)
+    summary = {}
+    for key, group in groups.items():
+        solved = [r for r in group if r["success"]]
+        summary[key] = {
+            "success_rate": len(solved)/len(group),
+            "time": np.mean([r["time"] for r in group]),
+            "setup_time": np.mean([r["setup_time"] for r in group]),
+            "num_iter": np.mean([r["num_iter"] for r in group]),
+            "cost": np.mean([r["cost"] for r in solved]) if solved else None,
+        }
+    return summary
+
+def print_summary(summary, baseline=None):
+    print()
+    print("{:<20} {:<10} {:>8} {:>10} {:>10} {:>12} {:>10}".format(
+        "map", "planner", "success", "time (s)", "setup (s)", "expansions",
+        "vs base"))
+    for (map_name, planner_name), s in summary.items():
+        ratio = "-"
+        if baseline is not None and (map_name, planner_name) in baseline:
+            ratio = "{:.2f}x".format(
+                s["time"]/baseline[(map_name, planner_name)]["time"])
+        print("{:<20} {:<10} {:>7.0f}% {:>10.3f} {:>10.3f} {:>12.0f} {:>10}".format(
+            map_name, planner_name, 100*s["success_rate"], s["time"],
+            s["setup_time"], s["num_iter"], ratio))
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--planners", nargs="+", default=list(PLANNERS),
+        choices=list(PLANNERS))
+    parser.add_argument("--maps", nargs="+", default=["*"],
+        help="map name patterns, eg: 'maze-*'")
+    parser.add_argument("--large", action="store_true",
+        help="include the 4000x4000 maps")
+    parser.add_argument("--queries", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true",
+        help="skip the traced run used to measure peak memory")
+    parser.add_argument("--json", help="write results to this JSON file")
+    parser.add_argument("--csv", help="write results to this CSV file")
+    parser.add_argument("--compare",
+        help="JSON results from an earlier run to compare times against")
+    parser.add_argument("--instrument", action="store_true",
+        help="report calls and time in hot methods (slows planners down)")
+    parser.add_argument("--profile", choices=["cprofile", "sample"],
+        help="also profile planner updates, implies --instrument")
+    args = parser.parse_args()
+
+    cases = make_corpus(args.seed, args.queries, args.large, args.maps)
+    instrumented = contextlib.nullcontext()
+    if args.instrument or args.profile:
+        instrumented = planner.instrument(profile=args.profile)
+    with instrumented as report:
+        records = run(args.planners, cases, args.seed, not args.no_memory)
+    if report is not None:
+        print(report)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = summarise(json.load(f)["records"])
+    print_summary(summarise(records), baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "revision": git_revision(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "seed": args.seed,
+                "records": records,
+            }, f, indent=1)
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ import numpy as np
 import pygame as pg
 import pygame_gui as pgu
 from sspace import OccupancyMap, MazeGenerator
-from sspace import StateSpaceGrid
+from sspace import StateSpaceGrid, GridRenderer
 import planner
 
 class WindowLayout:
@@ -51,7 +51,7 @@ class Window:
         # Build gui
 
         self.drop_down_planner = pgu.elements.UIDropDownMenu(
-            ["A*", "RRT*"],
+            ["A*", "Bidir A*", "Theta*", "JPS", "HPA*", "RRT*", "D* Lite"],
             "A*",
             relative_rect=self.layout.top_bar_element_rect(0),
             manager=self.manager)
@@ -87,6 +87,13 @@ class Window:
             manager=self.manager)
 
         self.resolution = 5
+        self.maze_cell_size = 10
+        # Time for the maze and planner updates in each frame, leaving the
+        # rest of a 60 FPS frame for events and drawing
+        self.update_budget_ms = 10
+        # Planner state is rendered at most this often, however fast it
+        # changes
+        self.render_fps = 30
 
         self.occ_color = self.manager.get_theme().get_colour("normal_bg")
 
@@ -101,6 +108,7 @@ class Window:
 
         self.maze = None
         self.planner = None
+        self.renderer = None
 
     def pos_to_node(self, pos):
         return np.array([
@@ -108,34 +116,55 @@ class Window:
             int((pos[1]-self.layout.occ_map_rect.y)/self.occ_map.resolution)
         ])
 
+    # The planner runs in a PlanWorker, and the window draws its latest
+    # snapshot, so the search never holds up a frame
     def start_planner(self, planner_type):
-        sspace = StateSpaceGrid(self.occ_map)
+        sspace = StateSpaceGrid(self.occ_map, compiled=True)
         start_node = self.pos_to_node(self.start)
         goal_node = self.pos_to_node(self.goal)
         if planner_type=="A*":
-            self.planner = planner.AStar(sspace)
-            self.planner.start(start_node, goal_node)
-            return True
+            search = planner.AStar(sspace)
+        elif planner_type=="Bidir A*":
+            search = planner.BidirectionalAStar(sspace)
+        elif planner_type=="Theta*":
+            search = planner.ThetaStar(sspace)
+        elif planner_type=="JPS":
+            search = planner.JPS(sspace)
+        elif planner_type=="HPA*":
+            # Clusters line up with the cells of generated mazes
+            search = planner.HPAStar(sspace, self.maze_cell_size)
         elif planner_type=="RRT*":
-            self.planner = planner.RRT(sspace, 1e4, 5)
-            self.planner.start(start_node, goal_node)
-            return True
+            search = planner.RRTStar(sspace, 5e4, 5)
+        elif planner_type=="D* Lite":
+            search = planner.DStarLite(sspace)
+        else:
+            return False
+        self.renderer = GridRenderer(sspace, max_fps=self.render_fps, observe=False)
+        self.planner = planner.PlanWorker(search, start_node, goal_node,
+            snapshot_hz=self.render_fps)
+        return True
 
-        return False
+    def stop_planner(self):
+        self.planner.cancel()
+        self.planner.join()
+        self.planner = None
+        self.renderer = None
 
     def update(self, dt):
         if self.maze is not None:
-            self.maze.update(self.occ_map)
+            self.maze.step(self.occ_map, budget_ms=self.update_budget_ms)
             if self.maze.complete:
                 self.maze = None
                 self.button_maze.set_text("Gen Maze")
-        if self.planner is not None:
-            self.planner.update()
-            if self.planner.complete:
-                self.button_plan.set_text("Clear Plan")
+        # D* Lite keeps repairing its plan as the map is edited, until it
+        # is cleared
+        if self.planner is not None and self.planner.idle.is_set():
+            self.button_plan.set_text("Clear Plan")
 
         for event in pg.event.get():
             if event.type == pg.QUIT:
+                if self.planner is not None:
+                    self.stop_planner()
                 return False
             elif event.type == pg.USEREVENT:
                 if event.user_type == pgu.UI_BUTTON_PRESSED:
@@ -146,7 +175,7 @@ class Window:
                                     self.maze = None
                                 self.button_plan.set_text("Stop")
                         else:
-                            self.planner = None
+                            self.stop_planner()
                             self.button_plan.set_text("Plan")
 
                     elif event.ui_element == self.button_clear:
@@ -164,7 +193,7 @@ class Window:
                             self.mouse_3_down = False
                     elif event.ui_element == self.button_maze:
                         if self.maze is None:
-                            self.maze = MazeGenerator(self.occ_map, 10)
+                            self.maze = MazeGenerator(self.occ_map, self.maze_cell_size)
                             self.button_maze.set_text("Stop Maze")
                         else:
                             self.maze = None
@@ -217,7 +246,8 @@ class Window:
             (self.layout.occ_map_rect.x,
              self.layout.occ_map_rect.y))
         if self.planner is not None:
-            self.planner.draw(
+            self.renderer.show(self.planner.snapshot())
+            self.renderer.draw(
                 self.surface,
                 (self.layout.occ_map_rect.x,
                  self.layout.occ_map_rect.y))
@@ -1,2 +1,16 @@
 from ._a_star import AStar
 from ._rrt import RRT
+from ._rrt_star import RRTStar
+from ._nearest import LinearIndex, KDTreeIndex
+from ._solve import solve, PlanResult, path_cost, path_length
+from ._cost_to_go import CostToGo, CostToGoCache, CostToGoField
+from ._d_star_lite import DStarLite
+from ._jps import JPS
+from ._batch import solve_batch
+from ._hpa_star import HPAStar, ClusterGraph
+from ._bidirectional import BidirectionalAStar
+from ._theta_star import ThetaStar
+from ._smooth import smooth_path
+from ._worker import PlanWorker, PlanSnapshot, plan
+from ._distance_matrix import distance_matrix, DistanceMatrixCache, MatrixPaths
+from ._instrument import instrument, Report
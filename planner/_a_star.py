@@ -1,97 +1,116 @@
-import pygame as pg
+import heapq
+import itertools
 import numpy as np
 
 from ._planner import Planner
 
+# Values of the "checked" variable
+UNSEEN = 0
+OPEN = 1
+CLOSED = 2
+
 class AStar(Planner):
     def __init__(self, sspace):
         super().__init__(sspace)
-        self.unvisited = []
-        self.sspace.create_variables(["g", "h", "f", "checked"])
+        self.open_set = []
+        # parent is the flat index of the cell each node was reached from.
+        # The heuristic is computed when a node is pushed, not stored.
+        self.sspace.create_variables(
+            {"g": np.float32, "checked": np.uint8, "parent": np.int32})
         self.sspace.setup_drawing("g")
-        self.active = False
-        self.complete = False
-        self.path_nodes = []
 
     def start(self, start, goal):
-        self.start = start
-        self.goal = goal
+        self.start_node = self.sspace.encode(start)
+        self.goal = self.sspace.encode(goal)
         self.num_iter = 0
         self.distance = 0
         self.sspace.reset_variables()
-        self.unvisited = [self.start]
-        self.initialise_node(self.start, 0)
+        self.open_set = []
+        self.counter = itertools.count()
+        self.path_nodes = []
+        # Node closest to the goal reached so far, for best_path
+        self.best = None
+        self.best_h = float("inf")
+        # The start is its own parent, which ends the path
+        self.open_node(self.start_node, 0, self.sspace.to_index(self.start_node))
         self.active = True
         self.complete = False
 
-    def initialise_node(self, node, g_init):
+    def open_node(self, node, g, parent):
+        self.sspace.set_variable("checked", node, OPEN)
+        self.sspace.set_variable("parent", node, parent)
+        self.sspace.set_variable("g", node, g)
         h = self.sspace.distance(node, self.goal)
-        self.sspace.set_variable("h", node, h)
-        self.update_node(node, g_init)
+        if h < self.best_h:
+            self.best = node
+            self.best_h = h
+        self.push_open(node, g + h)
 
-    def update_node(self, node, g):
-        h = self.sspace.get_variable("h", node)
-        f = h + g
-        self.sspace.set_variable("g", node, g)
-        self.sspace.set_variable("f", node, f)
+    # The open set is a binary heap of (f, count, node). Improving the g of
+    # a node pushes a new entry rather than moving the old one, and stale
+    # entries are skipped when popped (lazy deletion).
+    # The count breaks ties between equal f without comparing nodes.
+
+    def push_open(self, node, f):
+        heapq.heappush(self.open_set, (f, next(self.counter), node))
+
+    def pop_open(self):
+        while self.open_set:
+            _, _, node = heapq.heappop(self.open_set)
+            if self.sspace.get_variable("checked", node) != CLOSED:
+                return node
+        return None
 
     def update(self):
         if self.active:
             self.num_iter += 1
-            best_f = None
-            best_candidate = None
-            best_i = None
-            for i, candidate in enumerate(self.unvisited):
-                f = self.sspace.get_variable("f", candidate)
-                if best_f is None or f < best_f:
-                    best_f = f
-                    best_candidate = candidate
-                    best_i = i
-
-            if best_i is None:
+            current = self.pop_open()
+
+            if current is None:
                 print("No solution found")
                 self.active = False
                 return
 
-            self.unvisited.pop(best_i)
-            current = best_candidate
+            self.sspace.set_variable("checked", current, CLOSED)
 
             if self.sspace.same_node(current, self.goal):
                 self.active = False
                 self.find_path()
                 return
 
-            for neighbour in self.sspace.neighbours(current):
-                if self.sspace.get_variable("checked", neighbour) == 0:
-                    self.sspace.set_variable("checked", neighbour, 1)
-                    self.unvisited.append(neighbour)
-                    new_g = self.sspace.get_variable("g", current) + \
-                        self.sspace.distance(current, neighbour)
-                    self.initialise_node(neighbour, new_g)
-                else:
-                    prev_g = self.sspace.get_variable("g", neighbour)
-                    new_g = self.sspace.get_variable("g", current) + \
-                        self.sspace.distance(current, neighbour)
-                    if new_g < prev_g:
-                        self.sspace.set_variable("g", neighbour, new_g)
+            self.expand(current)
+
+    def expand(self, current):
+        get_variable = self.sspace.get_variable
+        current_index = self.sspace.to_index(current)
+        current_g = get_variable("g", current)
+        for neighbour, cost in self.sspace.edges(current):
+            checked = get_variable("checked", neighbour)
+            if checked == CLOSED:
+                continue
+            new_g = current_g + cost
+            if checked == UNSEEN or new_g < get_variable("g", neighbour):
+                self.open_node(neighbour, new_g, current_index)
+
+    # Nodes from the given node back to the start
+    def trace(self, node):
+        nodes = []
+        i = self.sspace.to_index(node)
+        while True:
+            nodes.append(self.sspace.to_node(i))
+            parent = self.sspace.get_variable("parent", i)
+            if parent == i:
+                return nodes
+            i = parent
+
+    # Until the goal is reached, the path to the node closest to it
+    def best_path(self):
+        if self.complete or self.best is None:
+            return self.path_nodes
+        return self.trace(self.best)
 
     def find_path(self):
-        current = self.goal
-        self.path_nodes.append(current)
-        while not self.sspace.same_node(current, self.start):
-            min_g = self.sspace.get_variable("g", current)
-            next_node = None
-            for neighbour in self.sspace.neighbours(current):
-                if self.sspace.get_variable("checked", neighbour)==0:
-                    continue
-                neighbour_g = self.sspace.get_variable("g", neighbour)
-                if neighbour_g < min_g:
-                    min_g = neighbour_g
-                    next_node = neighbour
-            if next_node is None:
-                break
-            self.distance += 1
-            current = next_node
-            self.path_nodes.append(current)
+        self.path_nodes = self.trace(self.goal)
+        self.distance = len(self.path_nodes) - 1
         self.sspace.draw_path(self.path_nodes)
         self.complete = True
@@ -0,0 +1,84 @@
+import functools
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from sspace import OccupancyMap, StateSpaceGrid, GridGraph
+from ._a_star import AStar
+from ._solve import solve
+
+# Runs many start/goal queries over one occupancy map on a process pool.
+# The state space is built once, and its arrays (the grid, any costmap
+# costs and the compiled graph) are copied once into shared memory. Each
+# worker plans on read-only views of them, so the map is never pickled per
+# task or copied per worker. Results are yielded as (query index,
+# PlanResult) in the order they finish, eg:
+#   for i, result in planner.solve_batch(occ_map, queries):
+#       ...
+#
+# Forked workers would all start from the parent's np.random state, so
+# sampling planners (eg: RRT) would draw the same samples in every worker,
+# and results would depend on scheduling. Instead each query gets its own
+# child of SeedSequence(seed), which seeds np.random before it is solved,
+# so a batch with a given seed can be reproduced. A sampler given in
+# sspace_kwargs keeps its own generator, copied to each worker.
+
+# State of each worker process, set by init_worker
+worker = {}
+
+def init_worker(blocks, resolution, sampler):
+    # Pool workers share the parent's resource tracker, so attaching
+    # doesn't take ownership of the blocks, which the parent unlinks
+    worker["shm"] = []
+    arrays = {}
+    for key, (name, shape, dtype) in blocks.items():
+        shm = shared_memory.SharedMemory(name=name)
+        worker["shm"].append(shm)
+        arrays[key] = np.ndarray(shape, dtype, buffer=shm.buf)
+        arrays[key].flags.writeable = False
+    graph = None
+    if "indptr" in arrays:
+        graph = GridGraph.from_arrays(arrays["grid"].shape,
+            arrays["indptr"], arrays["indices"], arrays["costs"])
+    worker["sspace"] = StateSpaceGrid.from_arrays(
+        OccupancyMap.from_array(arrays["grid"], resolution, copy=False),
+        arrays.get("cell_costs"), graph, sampler)
+
+def run_query(planner_type, kwargs, task):
+    i, start, goal, seed = task
+    np.random.seed(seed.generate_state(4))
+    return i, solve(worker["sspace"], start, goal, planner_type, **kwargs)
+
+def solve_batch(occ_map, queries, planner_type=AStar, processes=None,
+        sspace_kwargs=None, chunksize=1, seed=None, **kwargs):
+    if sspace_kwargs is None:
+        sspace_kwargs = {"compiled": True}
+    sspace = StateSpaceGrid(occ_map, **sspace_kwargs)
+    arrays = {"grid": sspace.occ_map != 0}
+    if sspace.cell_costs is not None:
+        arrays["cell_costs"] = sspace.cell_costs
+    if sspace.compiled:
+        graph = sspace.get_graph()
+        arrays.update(indptr=graph.indptr, indices=graph.indices, costs=graph.costs)
+
+    shms = []
+    try:
+        blocks = {}
+        for key, arr in arrays.items():
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            shms.append(shm)
+            np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[:] = arr
+            blocks[key] = (shm.name, arr.shape, arr.dtype.str)
+        seeds = np.random.SeedSequence(seed)
+        tasks = ((i, np.asarray(start), np.asarray(goal), seeds.spawn(1)[0])
+            for i, (start, goal) in enumerate(queries))
+        with mp.Pool(processes, init_worker,
+                (blocks, occ_map.resolution, sspace.sampler)) as pool:
+            yield from pool.imap_unordered(
+                functools.partial(run_query, planner_type, kwargs),
+                tasks, chunksize)
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,186 @@
+import heapq
+import itertools
+import numpy as np
+
+from ._planner import Planner
+
+# Bidirectional A*, which grows one search forwards from the start and one
+# backwards from the goal until they meet. In a maze the region a search
+# explores grows with the square of its radius, so two searches that meet
+# half way explore much less than one that goes all the way.
+#
+# Both searches use the average potential p(v) = (h(v, goal) - h(v, start))/2
+# (Ikeda et al.), with forward keys g + p and backward keys g - p. This is
+# bidirectional Dijkstra on edge costs reduced by p, which are never
+# negative since the heuristic is consistent. mu is the cost of the best
+# path found so far, through a cell reached by both searches, and it is
+# optimal once the smallest forward and backward keys sum to at least mu.
+# With heuristic=False, p is 0 and this is bidirectional Dijkstra.
+#
+# Edges into a cell exist only when it is free, so the backward search
+# only steps into free cells, or into the start, which may be occupied.
+# The potential stays consistent with a costmap, whose edge costs are
+# never less than their length.
+
+# Bits of the "state" variable
+FORWARD_OPEN = 1
+FORWARD_CLOSED = 2
+BACKWARD_OPEN = 4
+BACKWARD_CLOSED = 8
+
+class BidirectionalAStar(Planner):
+    def __init__(self, sspace, heuristic=True):
+        super().__init__(sspace)
+        self.heuristic = heuristic
+        # g and parent (a flat index) of each search
+        self.sspace.create_variables({
+            "state": np.uint8,
+            "g_forward": np.float32, "parent_forward": np.int32,
+            "g_backward": np.float32, "parent_backward": np.int32})
+        self.sspace.setup_drawing("state")
+
+    def start(self, start, goal):
+        self.start_node = self.sspace.encode(start)
+        self.goal = self.sspace.encode(goal)
+        self.num_iter = 0
+        self.path_nodes = []
+        self.sspace.reset_variables()
+        occ_map = self.sspace.occ_map
+        self.start_free = not occ_map[tuple(self.sspace.decode(self.start_node))]
+        self.goal_free = not occ_map[tuple(self.sspace.decode(self.goal))]
+        self.counter = itertools.count()
+        self.forward_set = []
+        self.backward_set = []
+        # The best path so far goes through meet
+        self.mu = np.inf
+        self.meet = None
+        self.label(self.start_node, 0, self.sspace.to_index(self.start_node), True)
+        self.label(self.goal, 0, self.sspace.to_index(self.goal), False)
+        self.active = True
+        self.complete = False
+
+    def potential(self, node):
+        if not self.heuristic:
+            return 0.0
+        return (self.sspace.distance(node, self.goal) -
+            self.sspace.distance(node, self.start_node))/2
+
+    def label(self, node, g, parent, forward):
+        sspace = self.sspace
+        state = sspace.get_variable("state", node)
+        if forward:
+            sspace.set_variable("state", node, state | FORWARD_OPEN)
+            sspace.set_variable("g_forward", node, g)
+            sspace.set_variable("parent_forward", node, parent)
+            heapq.heappush(self.forward_set,
+                (g + self.potential(node), next(self.counter), node))
+            if state & BACKWARD_OPEN:
+                self.meet_at(node, g + sspace.get_variable("g_backward", node))
+        else:
+            sspace.set_variable("state", node, state | BACKWARD_OPEN)
+            sspace.set_variable("g_backward", node, g)
+            sspace.set_variable("parent_backward", node, parent)
+            heapq.heappush(self.backward_set,
+                (g - self.potential(node), next(self.counter), node))
+            if state & FORWARD_OPEN:
+                self.meet_at(node, g + sspace.get_variable("g_forward", node))
+
+    def meet_at(self, node, cost):
+        if cost < self.mu:
+            self.mu = cost
+            self.meet = node
+
+    # Smallest key in an open set, after dropping entries already closed
+    def top(self, open_set, closed):
+        while open_set:
+            key, _, node = open_set[0]
+            if not self.sspace.get_variable("state", node) & closed:
+                return key
+            heapq.heappop(open_set)
+        return np.inf
+
+    # (node, cost) of the edges into a node, for the backward search.
+    # With a costmap an edge costs more the higher the cost of the cell it
+    # enters, so edges into the node are scaled by its cost rather than by
+    # the cost of the neighbour, as StateSpaceGrid.edges would.
+    def in_edges(self, node):
+        sspace = self.sspace
+        if not sspace.same_node(node, self.goal) or self.goal_free:
+            scale = 1
+            if sspace.cell_costs is None:
+                yield from sspace.edges(node)
+            else:
+                scale = 1 + float(sspace.cell_costs.flat[sspace.to_index(node)])
+                for neighbour, _ in sspace.edges(node):
+                    yield neighbour, sspace.distance(node, neighbour)*scale
+            # Edges out of an occupied start are the only ones from an
+            # occupied cell that a path can use
+            if not self.start_free:
+                cost = sspace.distance(node, self.start_node)
+                if cost < 1.5:
+                    yield self.start_node, cost*scale
+
+    def update(self):
+        if not self.active:
+            return
+        top_forward = self.top(self.forward_set, FORWARD_CLOSED)
+        top_backward = self.top(self.backward_set, BACKWARD_CLOSED)
+        if top_forward + top_backward >= self.mu or \
+           top_forward == np.inf or top_backward == np.inf:
+            self.active = False
+            if self.mu < np.inf:
+                self.find_path()
+            else:
+                print("No solution found")
+            return
+        self.num_iter += 1
+        self.expand(top_forward <= top_backward)
+
+    def expand(self, forward):
+        sspace = self.sspace
+        if forward:
+            _, _, current = heapq.heappop(self.forward_set)
+            opened, closed, g_name = FORWARD_OPEN, FORWARD_CLOSED, "g_forward"
+            edges = sspace.edges(current)
+        else:
+            _, _, current = heapq.heappop(self.backward_set)
+            opened, closed, g_name = BACKWARD_OPEN, BACKWARD_CLOSED, "g_backward"
+            edges = self.in_edges(current)
+        sspace.set_variable("state", current,
+            sspace.get_variable("state", current) | closed)
+        g = sspace.get_variable(g_name, current)
+        current_index = sspace.to_index(current)
+        for neighbour, cost in edges:
+            state = sspace.get_variable("state", neighbour)
+            if state & closed:
+                continue
+            new_g = g + cost
+            if not state & opened or new_g < sspace.get_variable(g_name, neighbour):
+                self.label(neighbour, new_g, current_index, forward)
+
+    # Cells from a node to the end of one search, following its parents
+    def trace(self, node, forward):
+        parent_name = "parent_forward" if forward else "parent_backward"
+        nodes = []
+        i = self.sspace.to_index(node)
+        while True:
+            nodes.append(self.sspace.to_node(i))
+            parent = self.sspace.get_variable(parent_name, i)
+            if parent == i:
+                return nodes
+            i = parent
+
+    def meeting_path(self):
+        return self.trace(self.meet, False)[::-1] + self.trace(self.meet, True)[1:]
+
+    # Until the searches finish, the best path found so far, which may not
+    # yet be the shortest
+    def best_path(self):
+        if self.complete or self.meet is None:
+            return self.path_nodes
+        return self.meeting_path()
+
+    def find_path(self):
+        self.path_nodes = self.meeting_path()
+        self.sspace.draw_path(self.path_nodes)
+        self.complete = True
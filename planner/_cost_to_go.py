@@ -0,0 +1,163 @@
+import collections
+import heapq
+import math
+import numpy as np
+
+from ._planner import Planner
+
+SQRT2 = math.sqrt(2)
+
+# For repeated queries to the same goal, the cost-to-go from every cell
+# can be computed once with a reverse Dijkstra search. Any start can then
+# reach the goal by following the field downhill, in O(path length).
+#
+# Fields are cached against the map contents and the goal. Editing the
+# occupancy map changes its version, so fields for the old version are
+# no longer used, and are dropped the next time that map is queried. A
+# state space that is behind its map is refreshed before it is used (see
+# StateSpaceGrid.sync).
+
+class CostToGoField:
+    def __init__(self, sspace, goal):
+        self.sspace = sspace
+        self.graph = sspace.get_graph()
+        self.goal = sspace.to_index(goal)
+        self.costs = np.full(sspace.occ_map.size, np.inf)
+        self.compute()
+
+    @property
+    def nbytes(self):
+        return self.costs.nbytes
+
+    def compute(self):
+        # The search runs outwards from the goal over edges reversed, so
+        # the cost of each cell is the cost to reach the goal from it. The
+        # cells with an edge into a free cell are its free neighbours, the
+        # same cells it has edges to. With a costmap, an edge costs more
+        # the higher the cost of the cell it enters, so the reversed edge
+        # into cell j from i is charged the cost of i, not of j as
+        # graph.costs would. Occupied cells have no edges into them, so
+        # only the goal is expanded if it is occupied.
+        indptr = self.graph.indptr
+        indices = self.graph.indices
+        edge_costs = self.graph.costs
+        cell_costs = self.sspace.cell_costs
+        if cell_costs is not None:
+            cell_costs = cell_costs.reshape(-1)
+        height = self.graph.shape[1]
+        costs = self.costs
+        costs[self.goal] = 0
+        open_set = [(0.0, self.goal)]
+        while open_set:
+            cost, i = heapq.heappop(open_set)
+            if cost > costs[i]:
+                continue
+            a, b = indptr[i], indptr[i+1]
+            if cell_costs is None:
+                in_costs = edge_costs[a:b]
+            else:
+                step = np.abs(indices[a:b] - i)
+                in_costs = np.where((step == 1) | (step == height), 1.0, SQRT2)* \
+                    (1 + float(cell_costs[i]))
+            for j, edge_cost in zip(indices[a:b].tolist(), in_costs.tolist()):
+                new_cost = cost + edge_cost
+                if new_cost < costs[j]:
+                    costs[j] = new_cost
+                    heapq.heappush(open_set, (new_cost, j))
+
+    def cost(self, node):
+        i = self.sspace.to_index(node)
+        if i == self.goal:
+            return 0.0
+        # The start may be occupied, so step to its best neighbour first
+        return min((c + self.costs[j] for j, c in self.graph.edges(i)),
+            default=np.inf)
+
+    # Returns the flat indices of the path from start to the goal, or None
+    # if the goal can't be reached
+    def path(self, start):
+        current = self.sspace.to_index(start)
+        path = [current]
+        while current != self.goal:
+            best = None
+            best_cost = np.inf
+            for j, c in self.graph.edges(current):
+                if c + self.costs[j] < best_cost:
+                    best = j
+                    best_cost = c + self.costs[j]
+            # The cost must fall at every step. It only fails to when the
+            # goal is unreachable.
+            if best is None or self.costs[best] >= self.costs[current]:
+                return None
+            current = best
+            path.append(current)
+        return path
+
+
+class CostToGoCache:
+    def __init__(self, max_bytes=256*2**20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        # (map_key, goal index): field, least recently used first
+        self.fields = collections.OrderedDict()
+
+    def get(self, sspace, goal):
+        map_key = sspace.sync()
+        key = (map_key, sspace.to_index(goal))
+        field = self.fields.get(key)
+        if field is not None:
+            self.fields.move_to_end(key)
+            return field
+
+        self.invalidate(map_key)
+        field = CostToGoField(sspace, goal)
+        self.fields[key] = field
+        self.nbytes += field.nbytes
+        # Always keep the newest field, even if it is over budget alone
+        while self.nbytes > self.max_bytes and len(self.fields) > 1:
+            _, old = self.fields.popitem(last=False)
+            self.nbytes -= old.nbytes
+        return field
+
+    # Drops fields computed from older versions of the given map
+    def invalidate(self, map_key):
+        uid, version = map_key
+        for key in list(self.fields):
+            if key[0][0] == uid and key[0][1] < version:
+                self.nbytes -= self.fields.pop(key).nbytes
+
+    def clear(self):
+        self.fields.clear()
+        self.nbytes = 0
+
+default_cache = CostToGoCache()
+
+
+# Answers queries from a cost-to-go cache. The first query to a goal runs
+# the reverse search, and later ones only follow the field.
+
+class CostToGo(Planner):
+    def __init__(self, sspace, cache=None):
+        super().__init__(sspace)
+        self.cache = cache if cache is not None else default_cache
+
+    def start(self, start, goal):
+        self.start_node = start
+        self.goal = goal
+        self.num_iter = 0
+        self.active = True
+        self.complete = False
+        self.path_nodes = []
+
+    def update(self):
+        if self.active:
+            self.num_iter += 1
+            self.active = False
+            field = self.cache.get(self.sspace, self.goal)
+            path = field.path(self.start_node)
+            if path is None:
+                print("No solution found")
+                return
+            self.path_nodes = [self.sspace.to_node(i) for i in reversed(path)]
+            self.sspace.draw_path(self.path_nodes)
+            self.complete = True
@@ -0,0 +1,216 @@
+import heapq
+import math
+import threading
+import numpy as np
+
+from ._planner import Planner
+
+# D* Lite (Koenig and Likhachev), an incremental planner for a grid that
+# changes while the plan is in use.
+#
+# The search runs backwards from the goal, so g is the cost from each cell
+# to the goal, and rhs is the one step lookahead of g. Once the search has
+# converged, the planner listens for edits to the occupancy map. An edit
+# changes the cost of the edges into the edited cells, so only their
+# neighbours are updated and the search repairs from there, which costs
+# roughly in proportion to the size of the change rather than the map.
+#
+# As in StateSpaceGrid, an edge exists into every free cell in bounds, so
+# edge costs depend only on whether the target cell is occupied.
+#
+# Keys are rounded to KEY_DECIMALS. Costs sum diagonal steps one at a
+# time, while the heuristic multiplies them out, so a tie in k1 could
+# otherwise compare greater by the last bit and end a repair early,
+# instead of falling through to k2.
+
+KEY_DECIMALS = 6
+
+class DStarLite(Planner):
+    incremental = True
+
+    def __init__(self, sspace):
+        super().__init__(sspace)
+        self.width, self.height = sspace.occ_map.shape
+        self.offsets = [(x, y, math.hypot(x, y))
+            for x in range(-1, 2) for y in range(-1, 2) if x!=0 or y!=0]
+        self.sspace.create_variables({"expanded": bool})
+        self.sspace.setup_drawing("expanded")
+        self.g = None
+        # Edits can come from another thread than the one planning, eg:
+        # the GUI's while a PlanWorker plans
+        self.changes = []
+        self.changes_lock = threading.Lock()
+        self.sspace.source.add_listener(self.map_changed)
+        self.cell_costs = np.zeros(sspace.occ_map.size)
+
+    def start(self, start, goal):
+        for rect in self.take_changes():
+            self.sspace.refresh(*rect)
+        size = self.width*self.height
+        # The map as last searched, so edits are found by comparing the
+        # edited region with it
+        self.free = (self.sspace.occ_map == 0).reshape(-1)
+        # Extra cost of entering each cell, from the state space's costmap
+        if self.sspace.cell_costs is not None:
+            self.cell_costs = self.sspace.cell_costs.reshape(-1).copy()
+        self.g = np.full(size, np.inf)
+        self.rhs = np.full(size, np.inf)
+        # Key each cell was last pushed with, for lazy deletion from the heap
+        self.open_key = {}
+        self.open_set = []
+        self.km = 0
+        self.start_node = self.sspace.to_index(start)
+        self.goal = self.sspace.to_index(goal)
+        self.num_iter = 0
+        self.path_nodes = []
+        self.rhs[self.goal] = 0
+        self.push(self.goal)
+        self.active = True
+        self.complete = False
+
+    # Octile distance, which is consistent for the 8-connected grid
+    def heuristic(self, a, b):
+        ax, ay = divmod(a, self.height)
+        bx, by = divmod(b, self.height)
+        dx, dy = abs(ax - bx), abs(ay - by)
+        return max(dx, dy) + (math.sqrt(2) - 1)*min(dx, dy)
+
+    def key(self, s):
+        k = min(self.g[s], self.rhs[s])
+        return (round(k + self.heuristic(self.start_node, s) + self.km, KEY_DECIMALS),
+            round(k, KEY_DECIMALS))
+
+    def push(self, s):
+        key = self.key(s)
+        self.open_key[s] = key
+        heapq.heappush(self.open_set, (key, s))
+
+    def top(self):
+        while self.open_set:
+            key, s = self.open_set[0]
+            if self.open_key.get(s) == key:
+                return key, s
+            heapq.heappop(self.open_set)
+        return (np.inf, np.inf), None
+
+    def neighbours(self, s):
+        x, y = divmod(s, self.height)
+        for dx, dy, cost in self.offsets:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.width and 0 <= ny < self.height:
+                yield nx*self.height + ny, cost
+
+    def update_vertex(self, u):
+        if u != self.goal:
+            rhs = np.inf
+            for s, cost in self.neighbours(u):
+                cost *= 1 + self.cell_costs[s]
+                if self.free[s] and cost + self.g[s] < rhs:
+                    rhs = cost + self.g[s]
+            self.rhs[u] = rhs
+        self.open_key.pop(u, None)
+        if self.g[u] != self.rhs[u]:
+            self.push(u)
+
+    def converged(self):
+        key, _ = self.top()
+        return key >= self.key(self.start_node) and \
+            self.rhs[self.start_node] == self.g[self.start_node]
+
+    def update(self):
+        if self.changes and self.g is not None:
+            self.apply_changes()
+            self.active = True
+        if not self.active:
+            return
+        self.num_iter += 1
+
+        if self.converged():
+            self.active = False
+            self.find_path()
+            return
+
+        k_old, u = self.top()
+        heapq.heappop(self.open_set)
+        del self.open_key[u]
+        k_new = self.key(u)
+        if k_old < k_new:
+            self.push(u)
+        elif self.g[u] > self.rhs[u]:
+            self.g[u] = self.rhs[u]
+            self.sspace.set_variable("expanded", u, 1)
+            for s, _ in self.neighbours(u):
+                self.update_vertex(s)
+        else:
+            self.g[u] = np.inf
+            self.update_vertex(u)
+            for s, _ in self.neighbours(u):
+                self.update_vertex(s)
+
+    # Moves the start, eg: as the robot follows the path.
+    # km keeps the keys already in the heap valid lower bounds.
+    def set_start(self, node):
+        node = self.sspace.to_index(node)
+        self.km += self.heuristic(self.start_node, node)
+        self.start_node = node
+        self.active = True
+
+    # Edits are applied by the next update, so the planner is active again
+    # until it has repaired the plan
+    def map_changed(self, x0, y0, x1, y1):
+        with self.changes_lock:
+            self.changes.append((x0, y0, x1, y1))
+        if self.g is not None:
+            self.active = True
+
+    # The edits recorded since the last call
+    def take_changes(self):
+        with self.changes_lock:
+            changes = self.changes
+            self.changes = []
+        return changes
+
+    def apply_changes(self):
+        shape = (self.width, self.height)
+        for rect in self.take_changes():
+            # With a costmap, cells around the edit can change too
+            x0, y0, x1, y1 = self.sspace.refresh(*rect)
+            new_free = self.sspace.occ_map[x0:x1, y0:y1] == 0
+            changed = self.free.reshape(shape)[x0:x1, y0:y1] != new_free
+            if self.sspace.cell_costs is not None:
+                new_costs = self.sspace.cell_costs[x0:x1, y0:y1]
+                old_costs = self.cell_costs.reshape(shape)[x0:x1, y0:y1]
+                changed |= old_costs != new_costs
+                old_costs[...] = new_costs
+            for x, y in np.argwhere(changed):
+                v = int((x0 + x)*self.height + (y0 + y))
+                self.free[v] = new_free[x, y]
+                # Edges into v changed cost, which changes the rhs of the
+                # cells they come from
+                for u, _ in self.neighbours(v):
+                    self.update_vertex(u)
+
+    def find_path(self):
+        self.path_nodes = []
+        self.complete = False
+        if self.g[self.start_node] == np.inf:
+            print("No solution found")
+            self.sspace.draw_path(self.path_nodes)
+            return
+        current = self.start_node
+        path = [current]
+        while current != self.goal:
+            best = None
+            best_cost = np.inf
+            for s, cost in self.neighbours(current):
+                cost *= 1 + self.cell_costs[s]
+                if self.free[s] and cost + self.g[s] < best_cost:
+                    best = s
+                    best_cost = cost + self.g[s]
+            if best is None:
+                break
+            current = best
+            path.append(current)
+        self.path_nodes = [self.sspace.to_node(s) for s in reversed(path)]
+        self.sspace.draw_path(self.path_nodes)
+        self.complete = True
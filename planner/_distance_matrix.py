@@ -0,0 +1,216 @@
+import array
+import collections
+import heapq
+import math
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Shortest path costs between every pair of a set of points, eg: waypoints
+# for task allocation, as a dense (n, n) matrix where [i, j] is the cost
+# from points[i] to points[j], or inf if there is no path.
+#
+# Each row is one Dijkstra search from its point over the compiled
+# GridGraph, which stops as soon as every other point is settled. Without
+# a costmap, and with every point free, costs are symmetric, so the
+# search from points[i] only has to settle points[i+1:], and the rest of
+# the row comes from the earlier searches.
+#
+# With processes > 1, rows are computed on a process pool. The graph is
+# copied once into shared memory, which every worker reads, so it is never
+# pickled per row.
+#
+# Matrices are cached against the map contents and the points, and those
+# for older versions of a map are dropped when it is next queried, as in
+# CostToGoCache, which also brings a state space that is behind its map
+# up to date first. The cached matrix is returned read-only.
+# With paths=True, a MatrixPaths is returned with the matrix, to extract
+# the path behind any entry, eg:
+#   costs, paths = planner.distance_matrix(sspace, points, paths=True)
+#   nodes = paths.path(i, j)
+
+# Costs from source to every cell, as an array of doubles, by Dijkstra
+# over the CSR arrays of a GridGraph, stopping once every cell of targets
+# is settled. parents, if given, is filled with the cell each settled
+# cell was reached from.
+def dijkstra(indptr, indices, edge_costs, source, targets, parents=None):
+    costs = array.array("d", [math.inf])*(len(indptr) - 1)
+    costs[source] = 0.0
+    remaining = set(targets)
+    open_set = [(0.0, source)]
+    while open_set and remaining:
+        cost, i = heapq.heappop(open_set)
+        if cost > costs[i]:
+            continue
+        remaining.discard(i)
+        a, b = indptr[i], indptr[i+1]
+        for j, edge_cost in zip(indices[a:b].tolist(), edge_costs[a:b].tolist()):
+            new_cost = cost + edge_cost
+            if new_cost < costs[j]:
+                costs[j] = new_cost
+                if parents is not None:
+                    parents[j] = i
+                heapq.heappush(open_set, (new_cost, j))
+    return costs
+
+# Costs from source to each of targets, as a list
+def source_costs(graph_arrays, task):
+    k, source, targets = task
+    costs = dijkstra(*graph_arrays, source, targets)
+    return k, [costs[t] for t in targets]
+
+# Graph arrays of each worker process, set by init_worker
+worker = {}
+
+def init_worker(blocks):
+    arrays = []
+    worker["shm"] = []
+    for name, shape, dtype in blocks:
+        shm = shared_memory.SharedMemory(name=name)
+        worker["shm"].append(shm)
+        arrays.append(np.ndarray(shape, dtype, buffer=shm.buf))
+    worker["graph"] = arrays
+
+def run_source(task):
+    return source_costs(worker["graph"], task)
+
+def graph_arrays(sspace):
+    graph = sspace.get_graph()
+    return graph.indptr, graph.indices, graph.costs
+
+# Runs the tasks, (row, source, targets), on a pool with the graph arrays
+# in shared memory
+def run_pool(arrays, tasks, processes):
+    shms = []
+    try:
+        blocks = []
+        for arr in arrays:
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            shms.append(shm)
+            np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[:] = arr
+            blocks.append((shm.name, arr.shape, arr.dtype.str))
+        with mp.Pool(processes, init_worker, (blocks,)) as pool:
+            return list(pool.imap_unordered(run_source, tasks))
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+def compute_matrix(sspace, cells, processes):
+    n = len(cells)
+    free = sspace.occ_map.reshape(-1)[cells] == 0
+    # Occupied cells have no edges into them, so are never settled
+    reachable = [int(c) for c, f in zip(cells, free) if f]
+    symmetric = sspace.cell_costs is None and free.all()
+    tasks = []
+    for k in range(n):
+        targets = reachable[k+1:] if symmetric else reachable
+        tasks.append((k, int(cells[k]), targets))
+
+    arrays = graph_arrays(sspace)
+    if processes is None:
+        processes = mp.cpu_count()
+    if processes > 1 and n > 1:
+        rows = run_pool(arrays, tasks, processes)
+    else:
+        rows = [source_costs(arrays, task) for task in tasks]
+
+    matrix = np.full((n, n), np.inf)
+    columns = np.flatnonzero(free)
+    for k, costs in rows:
+        if symmetric:
+            matrix[k, k+1:] = costs
+        else:
+            matrix[k, columns] = costs
+    if symmetric:
+        upper = np.triu_indices(n, 1)
+        matrix.T[upper] = matrix[upper]
+    np.fill_diagonal(matrix, 0)
+    return matrix
+
+
+class DistanceMatrixCache:
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        # (map_key, points): matrix, least recently used first
+        self.matrices = collections.OrderedDict()
+
+    def get(self, sspace, cells, processes):
+        map_key = sspace.sync()
+        key = (map_key, cells.tobytes())
+        matrix = self.matrices.get(key)
+        if matrix is not None:
+            self.matrices.move_to_end(key)
+            return matrix
+
+        self.invalidate(map_key)
+        matrix = compute_matrix(sspace, cells, processes)
+        matrix.flags.writeable = False
+        self.matrices[key] = matrix
+        while len(self.matrices) > self.max_entries:
+            self.matrices.popitem(last=False)
+        return matrix
+
+    # Drops matrices computed from older versions of the given map
+    def invalidate(self, map_key):
+        uid, version = map_key
+        for key in list(self.matrices):
+            if key[0][0] == uid and key[0][1] < version:
+                del self.matrices[key]
+
+    def clear(self):
+        self.matrices.clear()
+
+default_matrix_cache = DistanceMatrixCache()
+
+
+# Extracts the paths behind a distance matrix. A path from points[i] needs
+# the parents of a search from it, which is run again on first use, and
+# the parents of the last max_sources searches are kept.
+
+class MatrixPaths:
+    def __init__(self, sspace, cells, matrix, max_sources=4):
+        self.sspace = sspace
+        self.cells = cells
+        self.matrix = matrix
+        self.max_sources = max_sources
+        self.parents = collections.OrderedDict()
+
+    def get_parents(self, i):
+        parents = self.parents.get(i)
+        if parents is not None:
+            self.parents.move_to_end(i)
+            return parents
+        parents = array.array("i", [-1])*(len(self.sspace.get_graph().indptr) - 1)
+        targets = self.cells[np.isfinite(self.matrix[i])]
+        dijkstra(*graph_arrays(self.sspace), int(self.cells[i]),
+            targets.tolist(), parents)
+        self.parents[i] = parents
+        while len(self.parents) > self.max_sources:
+            self.parents.popitem(last=False)
+        return parents
+
+    # Nodes of the path from points[i] to points[j], or None if there is
+    # none
+    def path(self, i, j):
+        if not np.isfinite(self.matrix[i, j]):
+            return None
+        parents = self.get_parents(i)
+        source = int(self.cells[i])
+        current = int(self.cells[j])
+        path = [current]
+        while current != source:
+            current = parents[current]
+            path.append(current)
+        return [self.sspace.to_node(c) for c in reversed(path)]
+
+
+def distance_matrix(sspace, points, processes=None, paths=False, cache=None):
+    if cache is None:
+        cache = default_matrix_cache
+    cells = np.array([sspace.to_index(point) for point in points], np.int64)
+    matrix = cache.get(sspace, cells, processes)
+    if paths:
+        return matrix, MatrixPaths(sspace, cells, matrix)
+    return matrix
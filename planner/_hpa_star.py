@@ -0,0 +1,398 @@
+import heapq
+import itertools
+import math
+import threading
+import numpy as np
+
+from ._planner import Planner
+
+# Hierarchical path-finding A* (Botea, Muller and Schaeffer).
+#
+# The grid is split into square clusters of cluster_size cells. Where two
+# neighbouring clusters meet, each run of cells that are free on both
+# sides of the border is an entrance, and gets one transition (two for
+# long runs) joining a cell on each side. The cells of the transitions are
+# the nodes of a small abstract graph, whose edges are the transitions
+# themselves, and the costs between the entrance cells of each cluster,
+# found by searching inside that cluster only.
+#
+# A query joins the start and goal to the entrances of their clusters,
+# searches the abstract graph, and then refines each abstract edge to
+# cells with another search inside one cluster. Paths are not always
+# optimal, since they cross borders only at transitions, but are usually
+# within a few percent.
+#
+# Clusters fit the cells of MazeGenerator when cluster_size is the maze
+# cell size, as every wall gap then lies on a single border.
+#
+# The abstract graph listens for edits to the occupancy map. An edit
+# rebuilds the borders it touches, and the entrance costs only of the
+# clusters it touches or whose entrances moved.
+
+SQRT2 = math.sqrt(2)
+
+# (dx, dy, cost) of the 8 moves. As in StateSpaceGrid, a move is allowed
+# into any free cell.
+MOVES = [(dx, dy, math.hypot(dx, dy))
+    for dx in range(-1, 2) for dy in range(-1, 2) if dx != 0 or dy != 0]
+
+# Cost from each source to every cell of a block, moving only inside the
+# block, for an (w, h) bool array of free cells and a list of (x, y)
+# sources in block coordinates. All sources are relaxed together, one
+# move at a time, until no cost changes. Sources may be occupied, since
+# moves out of an occupied cell are allowed.
+def block_costs(free, sources):
+    n = len(sources)
+    w, h = free.shape
+    xs, ys = np.array(sources).reshape(n, 2).T
+    padded = np.full((n, w+2, h+2), np.inf)
+    padded[np.arange(n), xs+1, ys+1] = 0
+    costs = padded[:, 1:-1, 1:-1]
+    blocked = np.broadcast_to(~free, costs.shape).copy()
+    blocked[np.arange(n), xs, ys] = False
+    while True:
+        new = costs.copy()
+        for dx, dy, c in MOVES:
+            np.minimum(new, padded[:, 1-dx:w+1-dx, 1-dy:h+1-dy] + c, out=new)
+        new[blocked] = np.inf
+        if np.array_equal(new, costs):
+            return new
+        costs[...] = new
+
+# Transitions across a straight border, where side_a and side_b are the
+# free cells in the two rows facing each other, and cells_a and cells_b
+# their flat indices. Returns (a, b, cost) triples.
+def border_transitions(side_a, side_b, cells_a, cells_b, max_run):
+    both = side_a & side_b
+    transitions = []
+    edges = np.diff(np.concatenate(([0], both.astype(np.int8), [0])))
+    for s, e in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+        if e - s < max_run:
+            picks = [s + (e - s - 1)//2]
+        else:
+            picks = [s, e - 1]
+        transitions.extend((cells_a[i], cells_b[i], 1.0) for i in picks)
+    # Diagonal moves cross the border between cells that aren't facing.
+    # They only need a transition of their own when neither cell has a
+    # free cell facing it, as otherwise they can go through that entrance.
+    uncovered = ~both[:-1] & ~both[1:]
+    for i in np.flatnonzero(uncovered & side_a[:-1] & side_b[1:]):
+        transitions.append((cells_a[i], cells_b[i+1], SQRT2))
+    for i in np.flatnonzero(uncovered & side_a[1:] & side_b[:-1]):
+        transitions.append((cells_a[i+1], cells_b[i], SQRT2))
+    return transitions
+
+class ClusterGraph:
+    def __init__(self, sspace, cluster_size=10, max_run=6):
+        self.sspace = sspace
+        self.cluster_size = cluster_size
+        self.max_run = max_run
+        self.width, self.height = sspace.occ_map.shape
+        self.num_x = -(-self.width//cluster_size)
+        self.num_y = -(-self.height//cluster_size)
+        self.free = sspace.occ_map == 0
+        # Border key: list of (a, b, cost) transitions across it
+        self.transitions = {}
+        # Cell: {cell: cost} for transitions, in both directions
+        self.inter = {}
+        # Cluster: {entrance cell: number of transitions using it}
+        self.entrances = {}
+        # Cluster: {entrance cell: {entrance cell: cost}}
+        self.intra = {}
+        self.num_clusters_built = 0
+        # Edits can come from another thread than the one planning
+        self.changes = []
+        self.changes_lock = threading.Lock()
+
+        for key in self.border_keys(0, 0, self.num_x, self.num_y):
+            self.build_border(key)
+        for cx in range(self.num_x):
+            for cy in range(self.num_y):
+                self.build_cluster((cx, cy))
+        sspace.source.add_listener(self.map_changed)
+
+    def cluster(self, cell):
+        x, y = divmod(cell, self.height)
+        return (x//self.cluster_size, y//self.cluster_size)
+
+    # Cells of a cluster, as [x0, x1) x [y0, y1)
+    def cluster_rect(self, cluster):
+        cx, cy = cluster
+        s = self.cluster_size
+        return (cx*s, cy*s, min((cx+1)*s, self.width), min((cy+1)*s, self.height))
+
+    # Borders are keyed by their kind and the cluster at their top left.
+    # "x" joins (cx, cy) to (cx+1, cy), "y" joins (cx, cy) to (cx, cy+1),
+    # and "d" and "a" are the diagonal and anti-diagonal corners between
+    # the four clusters from (cx, cy) to (cx+1, cy+1).
+    def border_keys(self, cx0, cy0, cx1, cy1):
+        for cx in range(max(cx0, 0), min(cx1, self.num_x)):
+            for cy in range(max(cy0, 0), min(cy1, self.num_y)):
+                if cx + 1 < self.num_x:
+                    yield ("x", cx, cy)
+                if cy + 1 < self.num_y:
+                    yield ("y", cx, cy)
+                if cx + 1 < self.num_x and cy + 1 < self.num_y:
+                    yield ("d", cx, cy)
+                    yield ("a", cx, cy)
+
+    def find_transitions(self, key):
+        kind, cx, cy = key
+        x0, y0, x1, y1 = self.cluster_rect((cx, cy))
+        h = self.height
+        if kind == "x":
+            ys = np.arange(y0, y1)
+            return border_transitions(self.free[x1-1, y0:y1], self.free[x1, y0:y1],
+                ((x1-1)*h + ys).tolist(), (x1*h + ys).tolist(), self.max_run)
+        if kind == "y":
+            xs = np.arange(x0, x1)
+            return border_transitions(self.free[x0:x1, y1-1], self.free[x0:x1, y1],
+                (xs*h + y1-1).tolist(), (xs*h + y1).tolist(), self.max_run)
+        # The corners are at (x1, y1) = ((cx+1)*s, (cy+1)*s)
+        if kind == "d":
+            a, b = (x1-1, y1-1), (x1, y1)
+        else:
+            a, b = (x1, y1-1), (x1-1, y1)
+        if self.free[a] and self.free[b]:
+            return [(a[0]*h + a[1], b[0]*h + b[1], SQRT2)]
+        return []
+
+    # Rebuilds the transitions of a border. Returns the clusters on either
+    # side if they changed.
+    def build_border(self, key):
+        new = self.find_transitions(key)
+        old = self.transitions.get(key, [])
+        if new == old:
+            return ()
+        for a, b, _ in old:
+            self.unlink(a, b)
+            self.unlink(b, a)
+        for a, b, cost in new:
+            self.link(a, b, cost)
+            self.link(b, a, cost)
+        self.transitions[key] = new
+        if not new:
+            del self.transitions[key]
+        return {self.cluster(c) for t in old + new for c in t[:2]}
+
+    def link(self, a, b, cost):
+        self.inter.setdefault(a, {})[b] = cost
+        counts = self.entrances.setdefault(self.cluster(a), {})
+        counts[a] = counts.get(a, 0) + 1
+
+    def unlink(self, a, b):
+        del self.inter[a][b]
+        if not self.inter[a]:
+            del self.inter[a]
+        counts = self.entrances[self.cluster(a)]
+        counts[a] -= 1
+        if counts[a] == 0:
+            del counts[a]
+
+    # Costs between the entrances of a cluster
+    def build_cluster(self, cluster):
+        self.num_clusters_built += 1
+        entrances = list(self.entrances.get(cluster, {}))
+        self.intra[cluster] = {}
+        if not entrances:
+            return
+        costs = self.local_costs(cluster, entrances, entrances)
+        for a, row in zip(entrances, costs):
+            self.intra[cluster][a] = {b: c for b, c in zip(entrances, row)
+                if b != a and c < np.inf}
+
+    # Costs from each source to each target, moving only inside the given
+    # cluster, as a (sources, targets) array
+    def local_costs(self, cluster, sources, targets):
+        x0, y0, x1, y1 = self.cluster_rect(cluster)
+        fields = block_costs(self.free[x0:x1, y0:y1],
+            [(x - x0, y - y0) for x, y in (divmod(s, self.height) for s in sources)])
+        tx, ty = np.array([divmod(t, self.height) for t in targets]).reshape(-1, 2).T
+        return fields[:, tx - x0, ty - y0].tolist()
+
+    # Cells from a to b, moving only inside their cluster, found by
+    # following the cost field from a back down from b
+    def local_path(self, a, b):
+        cluster = self.cluster(a)
+        x0, y0, x1, y1 = self.cluster_rect(cluster)
+        ax, ay = divmod(a, self.height)
+        costs = block_costs(self.free[x0:x1, y0:y1], [(ax - x0, ay - y0)])[0]
+        x, y = divmod(b, self.height)
+        x, y = x - x0, y - y0
+        if costs[x, y] == np.inf:
+            return None
+        path = [b]
+        while costs[x, y] > 0:
+            best = None
+            best_cost = np.inf
+            for dx, dy, c in MOVES:
+                px, py = x - dx, y - dy
+                if 0 <= px < x1 - x0 and 0 <= py < y1 - y0 and \
+                   costs[px, py] + c < best_cost:
+                    best = (px, py)
+                    best_cost = costs[px, py] + c
+            x, y = best
+            path.append((x + x0)*self.height + y + y0)
+        path.reverse()
+        return path
+
+    # Yields the (cell, cost) abstract edges out of an entrance cell
+    def edges(self, cell):
+        yield from self.intra[self.cluster(cell)].get(cell, {}).items()
+        yield from self.inter.get(cell, {}).items()
+
+    def map_changed(self, x0, y0, x1, y1):
+        with self.changes_lock:
+            self.changes.append((x0, y0, x1, y1))
+
+    def apply_changes(self):
+        with self.changes_lock:
+            changes = self.changes
+            self.changes = []
+        s = self.cluster_size
+        for rect in changes:
+            # With a costmap, cells around the edit can change too
+            x0, y0, x1, y1 = self.sspace.refresh(*rect)
+            self.free[x0:x1, y0:y1] = self.sspace.occ_map[x0:x1, y0:y1] == 0
+            # Clusters containing edited cells, and borders with a cell
+            # in the edit, which are keyed by a cluster at most one before
+            cx0, cy0 = x0//s, y0//s
+            cx1, cy1 = (x1 - 1)//s + 1, (y1 - 1)//s + 1
+            clusters = {(cx, cy) for cx in range(cx0, cx1) for cy in range(cy0, cy1)}
+            for key in list(self.border_keys(cx0 - 1, cy0 - 1, cx1, cy1)):
+                clusters.update(self.build_border(key))
+            for cluster in clusters:
+                self.build_cluster(cluster)
+
+
+class HPAStar(Planner):
+    def __init__(self, sspace, cluster_size=10, graph=None):
+        super().__init__(sspace)
+        # A ClusterGraph can be shared by planners on the same state space
+        self.graph = graph if graph is not None else ClusterGraph(sspace, cluster_size)
+        self.sspace.create_variables(["g"])
+        self.sspace.setup_drawing("g")
+
+    def start(self, start, goal):
+        self.graph.apply_changes()
+        self.start_node = self.sspace.to_index(start)
+        self.goal = self.sspace.to_index(goal)
+        self.num_iter = 0
+        self.path_nodes = []
+        self.sspace.reset_variables()
+
+        # Join the start and goal to the entrances of their clusters. The
+        # start can also reach the goal directly in the same cluster.
+        graph = self.graph
+        start_cluster = graph.cluster(self.start_node)
+        goal_cluster = graph.cluster(self.goal)
+        targets = list(graph.entrances.get(start_cluster, {}))
+        if start_cluster == goal_cluster:
+            targets.append(self.goal)
+        self.start_edges = {}
+        if targets:
+            costs = graph.local_costs(start_cluster, [self.start_node], targets)[0]
+            self.start_edges = {t: c for t, c in zip(targets, costs) if c < np.inf}
+        # Only free cells can be entered, so an occupied goal can't be
+        # reached. Otherwise moves between free cells cost the same both
+        # ways, so the cost to the goal is the cost from it.
+        self.goal_edges = {}
+        entrances = list(graph.entrances.get(goal_cluster, {}))
+        if entrances and graph.free.reshape(-1)[self.goal]:
+            costs = graph.local_costs(goal_cluster, [self.goal], entrances)[0]
+            self.goal_edges = {e: c for e, c in zip(entrances, costs) if c < np.inf}
+
+        self.open_set = []
+        self.counter = itertools.count()
+        self.g = {self.start_node: 0}
+        self.parents = {self.start_node: None}
+        self.closed = set()
+        # Closed node closest to the goal, for best_path
+        self.best = self.start_node
+        self.best_h = self.heuristic(self.start_node)
+        self.push(self.start_node, 0)
+        self.active = True
+        self.complete = False
+
+    def heuristic(self, node):
+        x, y = divmod(node, self.sspace.height)
+        gx, gy = divmod(self.goal, self.sspace.height)
+        dx, dy = abs(x - gx), abs(y - gy)
+        return max(dx, dy) + (SQRT2 - 1)*min(dx, dy)
+
+    def push(self, node, g):
+        heapq.heappush(self.open_set,
+            (g + self.heuristic(node), next(self.counter), node))
+
+    def edges(self, node):
+        if node == self.start_node:
+            yield from self.start_edges.items()
+        yield from self.graph.edges(node)
+        if node in self.goal_edges:
+            yield self.goal, self.goal_edges[node]
+
+    def update(self):
+        if not self.active:
+            return
+        self.num_iter += 1
+        current = None
+        while self.open_set:
+            _, _, node = heapq.heappop(self.open_set)
+            if node not in self.closed:
+                current = node
+                break
+        if current is None:
+            print("No solution found")
+            self.active = False
+            return
+
+        self.closed.add(current)
+        self.sspace.set_variable("g", current, self.g[current])
+        h = self.heuristic(current)
+        if h < self.best_h:
+            self.best = current
+            self.best_h = h
+        if current == self.goal:
+            self.active = False
+            self.find_path()
+            return
+
+        g = self.g[current]
+        for node, cost in self.edges(current):
+            if node in self.closed:
+                continue
+            new_g = g + cost
+            if new_g < self.g.get(node, np.inf):
+                self.g[node] = new_g
+                self.parents[node] = current
+                self.push(node, new_g)
+
+    # Cells from the start to the given node, refined from the abstract
+    # path. Transitions join neighbouring cells, and every other abstract
+    # edge stays inside one cluster.
+    def trace(self, node):
+        abstract = []
+        current = node
+        while current is not None:
+            abstract.append(current)
+            current = self.parents[current]
+        abstract.reverse()
+
+        cells = [abstract[0]]
+        for a, b in zip(abstract, abstract[1:]):
+            if self.graph.cluster(a) != self.graph.cluster(b):
+                cells.append(b)
+            else:
+                cells.extend(self.graph.local_path(a, b)[1:])
+        return [self.sspace.to_node(i) for i in reversed(cells)]
+
+    # Until the goal is reached, the path to the closed node closest to it
+    def best_path(self):
+        if self.complete or self.num_iter == 0:
+            return self.path_nodes
+        return self.trace(self.best)
+
+    def find_path(self):
+        self.path_nodes = self.trace(self.goal)
+        self.sspace.draw_path(self.path_nodes)
+        self.complete = True
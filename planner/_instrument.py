@@ -0,0 +1,213 @@
+import collections
+import contextlib
+import cProfile
+import functools
+import heapq
+import importlib
+import io
+import pstats
+import sys
+import threading
+import time
+
+from ._planner import Planner
+
+# Counters and timers for the hot paths of planners, state spaces, maps
+# and drawing, eg:
+#   with planner.instrument() as report:
+#       planner.solve(sspace, start, goal)
+#   print(report)
+#
+# Instrumentation works by replacing the methods below with wrappers that
+# count calls and, with timers=True, time them (inclusive of the calls
+# they make), and putting the originals back on exit. Outside the context
+# nothing is wrapped, so it costs nothing. Planners, state spaces and
+# drawers should be created inside the context, since code that keeps a
+# bound method from before it started calls the original.
+#
+# Every Planner's update is counted (one update is one iteration, eg: one
+# expansion for AStar), under the name of the planner's class, as are
+# heapq's push and pop. Drawing is only counted if pygame was already
+# imported by the drawing module, so headless code never imports it.
+#
+# profile="cprofile" also runs cProfile during each update, and
+# profile="sample" samples the stack of the thread running an update
+# every sample_interval seconds, for a sampling profile with a smaller
+# overhead. Either is printed with the report.
+
+METHODS = [
+    ("sspace._sspace", "StateSpaceGrid", ["neighbours", "edges", "distance",
+        "get_variable", "set_variable", "segments_free", "segments_cost",
+        "random_nodes", "refresh"]),
+    ("sspace._occ_map", "OccupancyMap", ["set", "set_rect", "set_mask",
+        "set_circle", "clear", "fill", "redraw"]),
+    ("sspace._draw", "GridDrawer", ["fill_node", "path_changed"]),
+    ("sspace._draw", "GridRenderer", ["render", "path_changed"]),
+]
+
+HEAP_FUNCTIONS = ["heappush", "heappop"]
+
+class Report:
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.times = collections.Counter()
+        self.wall_time = 0.0
+        # The cProfile.Profile, and the number of samples of each function
+        # from sampling, when profiling
+        self.profile = None
+        self.samples = None
+
+    def __str__(self):
+        lines = ["{:<36} {:>12} {:>10} {:>10}".format(
+            "", "calls", "time", "per call")]
+        for name, count in sorted(self.counts.items(),
+                key=lambda item: (-self.times[item[0]], -item[1])):
+            if name in self.times:
+                t = self.times[name]
+                lines.append("{:<36} {:>12} {:>9.3f}s {:>8.2f}us".format(
+                    name, count, t, 1e6*t/count))
+            else:
+                lines.append("{:<36} {:>12}".format(name, count))
+        lines.append("{:<36} {:>12} {:>9.3f}s".format("wall time", "", self.wall_time))
+        if self.profile is not None:
+            out = io.StringIO()
+            pstats.Stats(self.profile, stream=out).sort_stats(
+                "cumulative").print_stats(20)
+            lines.append(out.getvalue())
+        if self.samples is not None:
+            total = max(sum(self.samples.values()), 1)
+            lines.append("")
+            lines.append("{:<60} {:>8} {:>6}".format("sampled function", "samples", "%"))
+            for function, count in self.samples.most_common(20):
+                lines.append("{:<60} {:>8} {:>5.1f}%".format(
+                    function[:60], count, 100*count/total))
+        return "\n".join(lines)
+
+
+# Samples the innermost frame of each thread inside an update, skipping
+# the frames of the wrappers here
+class StackSampler:
+    def __init__(self, interval):
+        self.interval = interval
+        self.samples = collections.Counter()
+        # Threads inside an update, by thread id
+        self.threads = collections.Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            for ident, depth in list(self.threads.items()):
+                frame = frames.get(ident)
+                while frame is not None and frame.f_code.co_filename == __file__:
+                    frame = frame.f_back
+                if depth > 0 and frame is not None:
+                    code = frame.f_code
+                    self.samples["{} ({}:{})".format(code.co_name,
+                        code.co_filename.rsplit("/", 1)[-1], frame.f_lineno)] += 1
+
+
+def wrap(function, name, report, timed):
+    counts = report.counts
+    times = report.times
+    if not timed:
+        @functools.wraps(function)
+        def counted(*args, **kwargs):
+            counts[name] += 1
+            return function(*args, **kwargs)
+        return counted
+
+    @functools.wraps(function)
+    def timed_function(*args, **kwargs):
+        t = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            times[name] += time.perf_counter() - t
+            counts[name] += 1
+    return timed_function
+
+# Wraps a planner's update, naming it by the class of the planner, and
+# running the profiler around it
+def wrap_update(function, report, timed, profiler, sampler):
+    counts = report.counts
+    times = report.times
+
+    @functools.wraps(function)
+    def update(self):
+        name = type(self).__name__ + ".update"
+        if sampler is not None:
+            sampler.threads[threading.get_ident()] += 1
+        if profiler is not None:
+            profiler.enable()
+        t = time.perf_counter() if timed else None
+        try:
+            return function(self)
+        finally:
+            if timed:
+                times[name] += time.perf_counter() - t
+            counts[name] += 1
+            if profiler is not None:
+                profiler.disable()
+            if sampler is not None:
+                sampler.threads[threading.get_ident()] -= 1
+    return update
+
+def planner_types(cls=Planner):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from planner_types(subclass)
+
+active = False
+
+@contextlib.contextmanager
+def instrument(timers=True, profile=None, sample_interval=0.001):
+    global active
+    if active:
+        raise RuntimeError("Instrumentation is already active")
+    if profile not in (None, "cprofile", "sample"):
+        raise ValueError("Unknown profile: {}".format(profile))
+    report = Report()
+    profiler = cProfile.Profile() if profile == "cprofile" else None
+    sampler = StackSampler(sample_interval) if profile == "sample" else None
+
+    # (owner, attribute, original) of everything replaced
+    replaced = []
+    def replace(owner, attribute, wrapper):
+        replaced.append((owner, attribute, getattr(owner, attribute)))
+        setattr(owner, attribute, wrapper)
+
+    active = True
+    try:
+        for module_name, class_name, methods in METHODS:
+            if module_name == "sspace._draw" and module_name not in sys.modules:
+                continue
+            cls = getattr(importlib.import_module(module_name), class_name)
+            for method in methods:
+                replace(cls, method, wrap(cls.__dict__[method],
+                    class_name + "." + method, report, timers))
+        for cls in planner_types():
+            if "update" in cls.__dict__:
+                replace(cls, "update", wrap_update(cls.__dict__["update"],
+                    report, timers, profiler, sampler))
+        for function in HEAP_FUNCTIONS:
+            replace(heapq, function, wrap(getattr(heapq, function),
+                "heapq." + function, report, timers))
+        if sampler is not None:
+            sampler.thread.start()
+        t = time.perf_counter()
+        try:
+            yield report
+        finally:
+            report.wall_time = time.perf_counter() - t
+    finally:
+        for owner, attribute, original in reversed(replaced):
+            setattr(owner, attribute, original)
+        if sampler is not None and sampler.thread.is_alive():
+            sampler.stopped.set()
+            sampler.thread.join()
+            report.samples = sampler.samples
+        if profiler is not None:
+            report.profile = profiler
+        active = False
@@ -0,0 +1,197 @@
+import heapq
+import itertools
+import numpy as np
+
+# Nearest neighbour indexes over the states of a growing tree.
+# States are kept in one contiguous array, which doubles in size when full,
+# and each insert returns the index of the new state in that array.
+# Distances are euclidean, matching StateSpaceGrid.distance.
+# Besides nearest, within(state, radius) returns an array of the indices
+# of every state within radius of state, as RRT* needs.
+
+class StateArray:
+    def __init__(self, dim=2, capacity=1024):
+        self.states = np.empty((capacity, dim))
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, state):
+        if self.size == len(self.states):
+            states = np.empty((2*len(self.states), self.states.shape[1]))
+            states[:self.size] = self.states
+            self.states = states
+        self.states[self.size] = state
+        self.size += 1
+        return self.size - 1
+
+    def closest(self, indices, state):
+        # Returns the closest of the given indices, and its squared distance
+        diff = self.states[indices] - state
+        dist2 = np.einsum("ij,ij->i", diff, diff)
+        i = np.argmin(dist2)
+        return indices[i], dist2[i]
+
+    # Nearest state to each of an (n, dim) array of states. While the
+    # array is small compared to n, brute force in one vectorised step is
+    # faster than n separate queries.
+    def nearest_batch(self, states, max_elements=2**20):
+        states = np.asarray(states, float)
+        if self.size*len(states) > max_elements:
+            return [self.nearest(state) for state in states]
+        diff = self.states[None, :self.size] - states[:, None]
+        return np.einsum("ijk,ijk->ij", diff, diff).argmin(axis=1).tolist()
+
+
+# Checks every state, but in a single vectorised step
+
+class LinearIndex(StateArray):
+    def insert(self, state):
+        return self.append(state)
+
+    def nearest(self, state):
+        i, _ = self.closest(np.arange(self.size), state)
+        return int(i)
+
+    def within(self, state, radius):
+        diff = self.states[:self.size] - state
+        return np.flatnonzero(np.einsum("ij,ij->i", diff, diff) <= radius*radius)
+
+
+# Incremental k-d tree. Points are added to leaf buckets, and a leaf is split
+# at the median of its widest axis once it holds more than leaf_size points
+# (see split_leaf for points that share the median).
+# Since tree vertices arrive in random order the tree stays roughly
+# balanced, so inserts and queries are O(log K).
+# Every node keeps the bounding box of its points, so subtrees far from a
+# query are skipped even when the query is far from the whole tree, as
+# RRT samples often are.
+
+class KDNode:
+    __slots__ = ("axis", "split", "left", "right", "points", "lo", "hi")
+
+    def __init__(self, points, dim):
+        self.axis = None
+        self.split = None
+        self.left = None
+        self.right = None
+        self.points = points
+        self.lo = [np.inf]*dim
+        self.hi = [-np.inf]*dim
+
+    def extend(self, state):
+        for d, v in enumerate(state):
+            if v < self.lo[d]:
+                self.lo[d] = v
+            if v > self.hi[d]:
+                self.hi[d] = v
+
+    # Squared distance from state to the bounding box
+    def box_dist2(self, state):
+        dist2 = 0.0
+        for d, v in enumerate(state):
+            if v < self.lo[d]:
+                dist2 += (self.lo[d] - v)**2
+            elif v > self.hi[d]:
+                dist2 += (v - self.hi[d])**2
+        return dist2
+
+class KDTreeIndex(StateArray):
+    def __init__(self, dim=2, capacity=1024, leaf_size=16):
+        super().__init__(dim, capacity)
+        self.dim = dim
+        self.leaf_size = leaf_size
+        self.root = KDNode([], dim)
+
+    def insert(self, state):
+        i = self.append(state)
+        state = self.states[i].tolist()
+        node = self.root
+        node.extend(state)
+        while node.points is None:
+            if state[node.axis] < node.split:
+                node = node.left
+            else:
+                node = node.right
+            node.extend(state)
+        node.points.append(i)
+        if len(node.points) > self.leaf_size:
+            self.split_leaf(node)
+        return i
+
+    def make_node(self, points):
+        node = KDNode(points.tolist(), self.dim)
+        states = self.states[points]
+        node.lo = states.min(axis=0).tolist()
+        node.hi = states.max(axis=0).tolist()
+        return node
+
+    # Points go left if they are < split. On grid states many points can
+    # share the median, so when the median leaves one side empty, it is
+    # tried as an upper bound (<= median), and then the midpoint of the
+    # axis, before moving to the next widest axis. The leaf is only left
+    # to grow if every point is the same.
+    def split_leaf(self, node):
+        points = np.array(node.points)
+        states = self.states[points]
+        spread = np.ptp(states, axis=0)
+        for axis in np.argsort(-spread).tolist():
+            if spread[axis] == 0:
+                break
+            values = states[:, axis]
+            median = np.median(values)
+            for split in (median, np.nextafter(median, np.inf),
+                          (values.min() + values.max())/2):
+                left = values < split
+                if left.any() and not left.all():
+                    node.axis = axis
+                    node.split = float(split)
+                    node.left = self.make_node(points[left])
+                    node.right = self.make_node(points[~left])
+                    node.points = None
+                    return
+
+    def nearest(self, state):
+        state = np.asarray(state, float).tolist()
+        best_i = None
+        best_dist2 = np.inf
+        # Subtrees are visited closest first, ordered by the distance from
+        # state to their bounding box, until none can hold a closer point.
+        # The count breaks ties without comparing nodes.
+        count = itertools.count()
+        queue = [(self.root.box_dist2(state), next(count), self.root)]
+        while queue:
+            bound, _, node = heapq.heappop(queue)
+            if bound >= best_dist2:
+                break
+            if node.points is None:
+                for child in (node.left, node.right):
+                    child_bound = child.box_dist2(state)
+                    if child_bound < best_dist2:
+                        heapq.heappush(queue, (child_bound, next(count), child))
+            elif len(node.points) > 0:
+                i, dist2 = self.closest(node.points, state)
+                if dist2 < best_dist2:
+                    best_i = i
+                    best_dist2 = dist2
+        return best_i
+
+    def within(self, state, radius):
+        state = np.asarray(state, float).tolist()
+        radius2 = radius*radius
+        leaves = []
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            if node.box_dist2(state) > radius2:
+                continue
+            if node.points is None:
+                nodes.append(node.left)
+                nodes.append(node.right)
+            elif node.points:
+                leaves.extend(node.points)
+        # Check the points of every leaf the ball reaches in one step
+        points = np.array(leaves, dtype=int)
+        diff = self.states[points] - state
+        return points[np.einsum("ij,ij->i", diff, diff) <= radius2]
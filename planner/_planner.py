@@ -1,6 +1,26 @@
+import time
+
+# Planners are driven by calling start, then update until active is False.
+# Each update does one iteration of the search. complete is set once a
+# path has been found, and path_nodes then holds it from goal to start.
+#
+# step runs many updates in one call, up to a count or a time budget, so
+# a GUI can fit as many as a frame allows and headless code can run a
+# search to the end. While a search runs, best_path gives the best path
+# found so far (see the planners for what that means for each).
+#
+# Incremental planners (eg: DStarLite) keep a converged search and repair
+# it when the map is edited, becoming active again until they have.
+
 class Planner:
+    incremental = False
+
     def __init__(self, sspace):
         self.sspace = sspace
+        self.active = False
+        self.complete = False
+        self.num_iter = 0
+        self.path_nodes = []
 
     def start(self, start, goal):
         raise NotImplementedError("Not implemented")
@@ -8,5 +28,25 @@ class Planner:
     def update(self):
         raise NotImplementedError("Not implemented")
 
+    # Runs up to n updates, or until budget_ms milliseconds have passed,
+    # stopping early once the planner is no longer active. With neither
+    # limit, runs until it finishes. Returns the number of updates run.
+    def step(self, n=None, budget_ms=None):
+        deadline = None
+        if budget_ms is not None:
+            deadline = time.perf_counter() + budget_ms/1000
+        i = 0
+        while self.active and (n is None or i < n):
+            self.update()
+            i += 1
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        return i
+
+    # Path from goal to start once complete, and otherwise the best partial
+    # path so far, which may not reach the goal. Empty if there is none.
+    def best_path(self):
+        return self.path_nodes
+
     def draw(self, surface, pos=(0, 0)):
         self.sspace.draw(surface, pos)
@@ -1,5 +1,6 @@
 import numpy as np
 from ._planner import Planner
+from ._nearest import KDTreeIndex
 
 class Vertex:
     def __init__(self, state, parent):
@@ -8,69 +9,121 @@ class Vertex:
         self.parent = parent
 
 class RRT(Planner):
-    def __init__(self, sspace, K, delta_q):
+    def __init__(self, sspace, K, delta_q, nn_index=KDTreeIndex, batch_size=1):
         super().__init__(sspace)
         self.K = K
         self.delta_q = delta_q
+        self.batch_size = batch_size
         # Use an adjacency list for the graph
         # Each element is a vertex, with a list of
         # neighbours (as references)
         self.G = []
-        self.sspace.create_variables(["visited"])
+        # Vertex states are also added to a nearest neighbour index, which
+        # is created on start from nn_index (eg: LinearIndex, KDTreeIndex).
+        # The i'th state in the index is the state of G[i].
+        self.nn_index = nn_index
+        self.nn = None
+        self.sspace.create_variables({"visited": bool})
         self.sspace.setup_drawing("visited")
         self.k = 0
-        self.complete = False
-        self.path_nodes = []
 
     def nearest_vertex(self, state):
-        closest_v = self.G[0]
-        smallest_dist = self.sspace.distance(closest_v.state, state)
-        for i in range(1, len(self.G)):
-            dist = self.sspace.distance(self.G[i].state, state)
-            if dist < smallest_dist:
-                smallest_dist = dist
-                closest_v = self.G[i]
-        return closest_v
+        return self.G[self.nn.nearest(state)]
+
+    def add_vertex(self, v):
+        self.G.append(v)
+        self.nn.insert(v.state)
+
+    # Steps up to delta_q from each near state towards its random state
+    def new_states(self, near_states, random_states):
+        direction = (random_states - near_states).astype(float)
+        norm = np.linalg.norm(direction, axis=-1, keepdims=True)
+        scale = np.minimum(1, self.delta_q/np.maximum(norm, 1e-9))
+        return np.rint(near_states + direction*scale).astype(int)
 
     def new_state(self, v, random_state):
-        direction = (random_state - v.state).astype(float)
-        norm = np.linalg.norm(direction)
-        if norm > self.delta_q:
-            direction /= norm
-        state = (v.state + direction * self.delta_q).astype(int)
-        return state
+        return self.new_states(v.state, random_state)
 
     def start(self, start, goal):
-        self.G.append(Vertex(start, None))
+        self.G = []
+        self.nn = self.nn_index(len(start))
+        self.add_vertex(Vertex(start, None))
         self.k = 0
+        self.num_iter = 0
+        self.active = True
         self.complete = False
+        self.path_nodes = []
         self.goal = goal
+        # Vertex closest to the goal, for best_path
+        self.best = self.G[0]
+        self.best_distance = self.sspace.distance(start, goal)
 
     def update(self):
-        if not self.complete:
-            v_new_valid = False
-            new_state = None
-            while not v_new_valid:
-                random_state = self.sspace.random_node()
-                v_near = self.nearest_vertex(random_state)
-                new_state = self.new_state(v_near, random_state)
-                v_new_valid = self.sspace._valid_state(new_state)
-            v_new = Vertex(new_state, v_near)
-            v_near.children.append(v_new)
-            self.G.append(v_new)
-            self.sspace.set_variable("visited", v_new.state, 1)
-            self.k+=1
-            if self.k == self.K:
-                self.complete = True
-            elif self.sspace.distance(v_new.state, self.goal) < self.delta_q:
-                self.find_path(v_new)
+        if self.active:
+            self.num_iter += 1
+            if self.batch_size > 1:
+                self.extend_batch()
+            else:
+                self.extend()
 
-    def find_path(self, final_vertex):
-        self.path_nodes.append(self.goal)
-        self.path_nodes.append(final_vertex.state)
-        v = final_vertex
-        while v.parent is not None:
+    def extend(self):
+        while True:
+            random_state = self.sspace.random_node()
+            v_near = self.nearest_vertex(random_state)
+            new_state = self.new_state(v_near, random_state)
+            if (new_state != v_near.state).any() and \
+               self.sspace.segment_free(v_near.state, new_state):
+                break
+        self.add_new_vertex(v_near, new_state)
+
+    # Draws batch_size samples at once, and checks all of their edges in
+    # one vectorised call. Every sample in a batch is extended from the
+    # tree as it was at the start of the batch.
+    def extend_batch(self):
+        random_states = self.sspace.random_nodes(self.batch_size)
+        near = [self.G[i] for i in self.nn.nearest_batch(random_states)]
+        near_states = np.array([v.state for v in near])
+        new_states = self.new_states(near_states, random_states)
+        valid = (new_states != near_states).any(axis=1) & \
+            self.sspace.segments_free(near_states, new_states)
+        for i in np.flatnonzero(valid):
+            self.add_new_vertex(near[i], new_states[i])
+            if not self.active:
+                break
+
+    def add_new_vertex(self, v_near, new_state):
+        v_new = Vertex(new_state, v_near)
+        v_near.children.append(v_new)
+        self.add_vertex(v_new)
+        self.sspace.set_variable("visited", v_new.state, 1)
+        self.k+=1
+        distance = self.sspace.distance(v_new.state, self.goal)
+        if distance < self.best_distance:
+            self.best = v_new
+            self.best_distance = distance
+        if distance < self.delta_q and \
+           self.sspace.segment_free(v_new.state, self.goal):
+            self.find_path(v_new)
+        elif self.k == self.K:
+            print("No solution found")
+            self.active = False
+
+    # States from the given vertex back to the start
+    def trace(self, v):
+        states = []
+        while v is not None:
+            states.append(v.state)
             v = v.parent
-            self.path_nodes.append(v.state)
+        return states
+
+    # Until the goal is reached, the path to the vertex closest to it
+    def best_path(self):
+        if self.complete or not self.G:
+            return self.path_nodes
+        return self.trace(self.best)
+
+    def find_path(self, final_vertex):
+        self.path_nodes = [self.goal] + self.trace(final_vertex)
+        self.active = False
         self.complete = True
         self.sspace.draw_path(self.path_nodes)
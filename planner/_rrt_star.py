@@ -0,0 +1,206 @@
+import math
+import numpy as np
+from ._planner import Planner
+from ._nearest import KDTreeIndex
+
+# RRT* (Karaman and Frazzoli). Like RRT, each sample steps the tree up to
+# delta_q towards a random state, but the new vertex is joined to whichever
+# vertex within a shrinking radius gives it the lowest cost-to-come, and
+# then becomes the parent of any vertex in that radius it gives a lower
+# cost. Every edge is collision checked, and costs come from
+# sspace.segments_cost, so they include costmap clearance costs.
+#
+# The search is anytime: it runs until K samples are drawn, whether or
+# not they extend the tree, and once the goal is reached path_nodes holds
+# the best path found so far, improving as the tree is rewired. Unlike
+# RRT's K, which counts vertices, K counts rejected samples too, so on
+# cluttered maps, where most samples are rejected, it needs to be several
+# times larger for a tree of the same size (eg: 5e4 in a maze where RRT
+# needs 1e4).
+#
+# The tree is kept in flat arrays indexed like the states of the nearest
+# neighbour index: the parent and cost-to-come of each vertex, and its
+# children as a linked list through first_child and next_sibling, so a
+# rewire can move a subtree and update its costs without any per-vertex
+# objects.
+
+class RRTStar(Planner):
+    # gamma scales the rewiring radius, which is the smaller of delta_q
+    # and gamma*sqrt(log(n)/n) for n vertices. By default it is the bound
+    # from the paper for the free area of the map.
+    def __init__(self, sspace, K, delta_q, nn_index=KDTreeIndex, gamma=None):
+        super().__init__(sspace)
+        self.K = K
+        self.delta_q = delta_q
+        if gamma is None:
+            free_area = sspace.num_free()
+            gamma = 2*math.sqrt(1.5)*math.sqrt(free_area/math.pi)
+        self.gamma = gamma
+        self.nn_index = nn_index
+        self.nn = None
+        self.sspace.create_variables({"visited": bool})
+        self.sspace.setup_drawing("visited")
+
+    def start(self, start, goal):
+        self.nn = self.nn_index(len(start))
+        capacity = 1024
+        self.parent = np.empty(capacity, np.int32)
+        self.cost = np.empty(capacity)
+        self.first_child = np.empty(capacity, np.int32)
+        self.next_sibling = np.empty(capacity, np.int32)
+        self.add_vertex(start, -1, 0.0)
+        self.goal = goal
+        self.num_iter = 0
+        self.active = True
+        self.complete = False
+        self.path_nodes = []
+        # Vertices with a free edge to the goal, and the cost of that edge
+        self.goal_vertices = []
+        self.goal_costs = []
+        self.solution_cost = np.inf
+        # Vertex closest to the goal, for best_path
+        self.best = 0
+        self.best_distance = self.sspace.distance(start, goal)
+
+    def grow(self):
+        size = 2*len(self.parent)
+        for name in ("parent", "cost", "first_child", "next_sibling"):
+            old = getattr(self, name)
+            new = np.empty(size, old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add_vertex(self, state, parent, cost):
+        v = self.nn.insert(state)
+        if v == len(self.parent):
+            self.grow()
+        self.cost[v] = cost
+        self.first_child[v] = -1
+        self.next_sibling[v] = -1
+        self.parent[v] = -1
+        if parent >= 0:
+            self.link(v, parent)
+        self.sspace.set_variable("visited", state, 1)
+        return v
+
+    def link(self, v, parent):
+        self.parent[v] = parent
+        self.next_sibling[v] = self.first_child[parent]
+        self.first_child[parent] = v
+
+    def unlink(self, v):
+        parent = self.parent[v]
+        child = self.first_child[parent]
+        if child == v:
+            self.first_child[parent] = self.next_sibling[v]
+            return
+        while self.next_sibling[child] != v:
+            child = self.next_sibling[child]
+        self.next_sibling[child] = self.next_sibling[v]
+
+    # Moves v under a new parent, and lowers the cost of v and everything
+    # below it by the same amount
+    def rewire(self, v, parent, cost):
+        self.unlink(v)
+        self.link(v, parent)
+        subtree = [v]
+        i = 0
+        while i < len(subtree):
+            child = self.first_child[subtree[i]]
+            while child >= 0:
+                subtree.append(child)
+                child = self.next_sibling[child]
+            i += 1
+        self.cost[subtree] += cost - self.cost[v]
+
+    def radius(self):
+        n = len(self.nn)
+        return min(self.delta_q, self.gamma*math.sqrt(math.log(n + 1)/(n + 1)))
+
+    def update(self):
+        if not self.active:
+            return
+        self.num_iter += 1
+        self.extend()
+        if self.num_iter >= self.K:
+            self.active = False
+            if not self.complete:
+                print("No solution found")
+
+    def extend(self):
+        sspace = self.sspace
+        random_state = sspace.random_node()
+        nearest = self.nn.nearest(random_state)
+        nearest_state = self.nn.states[nearest].astype(int)
+        direction = (random_state - nearest_state).astype(float)
+        norm = max(np.linalg.norm(direction), 1e-9)
+        new_state = np.rint(
+            nearest_state + direction*min(1, self.delta_q/norm)).astype(int)
+        if (new_state == nearest_state).all():
+            return
+
+        # Vertices within the radius, with the nearest first. Their edges
+        # to the new state are collision checked together, and the check
+        # also serves for rewiring, since a DDA line covers the same cells
+        # in either direction.
+        near = self.nn.within(new_state, self.radius())
+        near = np.concatenate(([nearest], near[near != nearest]))
+        near_states = self.nn.states[near].astype(int)
+        new_states = np.broadcast_to(new_state, near_states.shape)
+        free = sspace.segments_free(near_states, new_states)
+        if not free[0]:
+            return
+
+        # Choose the parent giving the lowest cost-to-come
+        costs = self.cost[near] + sspace.segments_cost(near_states, new_states)
+        costs[~free] = np.inf
+        i = int(np.argmin(costs))
+        v = self.add_vertex(new_state, near[i], costs[i])
+
+        # Rewire the vertices the new one gives a lower cost. Costs are
+        # checked again before each rewire, since an earlier one may have
+        # lowered them.
+        costs = self.cost[v] + sspace.segments_cost(new_states, near_states)
+        better = free & (costs < self.cost[near])
+        for u, cost in zip(near[better], costs[better]):
+            if cost < self.cost[u]:
+                self.rewire(u, v, cost)
+
+        distance = sspace.distance(new_state, self.goal)
+        if distance < self.best_distance:
+            self.best = v
+            self.best_distance = distance
+        if distance < self.delta_q and sspace.segment_free(new_state, self.goal):
+            self.goal_vertices.append(v)
+            self.goal_costs.append(
+                sspace.segments_cost([new_state], [self.goal])[0])
+        if self.goal_vertices:
+            self.update_solution()
+
+    # Rewiring can lower the cost of any vertex joined to the goal, so the
+    # best of them is checked after every new vertex
+    def update_solution(self):
+        costs = self.cost[self.goal_vertices] + self.goal_costs
+        i = int(np.argmin(costs))
+        if costs[i] < self.solution_cost:
+            self.solution_cost = costs[i]
+            self.find_path(self.goal_vertices[i])
+
+    # States from the given vertex back to the start
+    def trace(self, v):
+        states = []
+        while v >= 0:
+            states.append(self.nn.states[v].astype(int))
+            v = self.parent[v]
+        return states
+
+    # Until the goal is reached, the path to the vertex closest to it
+    def best_path(self):
+        if self.complete or self.nn is None:
+            return self.path_nodes
+        return self.trace(self.best)
+
+    def find_path(self, final_vertex):
+        self.path_nodes = [self.goal] + self.trace(final_vertex)
+        self.complete = True
+        self.sspace.draw_path(self.path_nodes)
@@ -0,0 +1,41 @@
+import numpy as np
+
+# Shortens a path, eg: the staircase of AStar or a jagged RRT branch, by
+# replacing runs of waypoints with straight lines. From each kept waypoint,
+# the furthest later one it has line of sight to is kept next, as long as
+# the straight line costs no more than the path it replaces (which only
+# matters with a costmap, since otherwise a line is never longer).
+#
+# Later waypoints are checked in batches of chunk, nearest first, stopping
+# after a batch with none in sight, so each step only looks a little past
+# the waypoint it keeps. Nodes can be in either order, and the smoothed
+# path is in the same order.
+
+def smooth_path(sspace, nodes, chunk=64):
+    nodes = [sspace.decode(node) for node in nodes]
+    if len(nodes) < 3:
+        return nodes
+    points = np.array(nodes)
+    # Cost along the path up to each waypoint
+    along = np.concatenate(
+        ([0], np.cumsum(sspace.segments_cost(points[:-1], points[1:]))))
+    smoothed = [nodes[0]]
+    i = 0
+    while i < len(points) - 1:
+        best = i + 1
+        lo = i + 1
+        while lo < len(points):
+            hi = min(lo + chunk, len(points))
+            candidates = points[lo:hi]
+            cost = sspace.segments_cost(
+                np.broadcast_to(points[i], candidates.shape), candidates)
+            ok = sspace.line_of_sight(points[i], candidates) & \
+                (cost <= along[lo:hi] - along[i] + 1e-6)
+            hits = np.flatnonzero(ok)
+            if len(hits) == 0:
+                break
+            best = max(best, lo + int(hits[-1]))
+            lo = hi
+        smoothed.append(nodes[best])
+        i = best
+    return smoothed
@@ -0,0 +1,77 @@
+import time
+import numpy as np
+
+from ._a_star import AStar
+from ._smooth import smooth_path
+
+# The length and number of waypoints of the path, and with smoothing, of
+# the path the planner found before it was smoothed. time covers the
+# search, and setup_time the construction of the planner before it (eg:
+# HPAStar's cluster graph or JPS+'s jump tables), when solve built it.
+class PlanResult:
+    def __init__(self, path, cost, success, num_iter, time, length=None,
+                 raw_length=None, raw_waypoints=None, setup_time=0.0):
+        self.path = path
+        self.cost = cost
+        self.success = success
+        self.num_iter = num_iter
+        self.time = time
+        self.setup_time = setup_time
+        self.length = cost if length is None else length
+        self.waypoints = len(path)
+        self.raw_length = self.length if raw_length is None else raw_length
+        self.raw_waypoints = self.waypoints if raw_waypoints is None else raw_waypoints
+
+    def __repr__(self):
+        return "PlanResult(success={}, cost={:.2f}, num_iter={}, time={:.3f})".format(
+            self.success, self.cost, self.num_iter, self.time)
+
+# Sum of the costs of the straight lines between consecutive nodes, which
+# is the path length unless the state space has a costmap
+def path_cost(sspace, nodes):
+    if len(nodes) < 2:
+        return 0.0
+    nodes = np.array([sspace.decode(node) for node in nodes])
+    return float(sspace.segments_cost(nodes[:-1], nodes[1:]).sum())
+
+# Total length of a path, which ignores any costmap
+def path_length(sspace, nodes):
+    if len(nodes) < 2:
+        return 0.0
+    nodes = np.array([sspace.decode(node) for node in nodes])
+    return float(np.hypot(*np.diff(nodes, axis=0).T).sum())
+
+# Runs a planner to completion without any drawing, for batch use.
+# Any extra keyword arguments are passed to the planner, eg:
+#   solve(sspace, start, goal, planner.RRT, K=1e4, delta_q=5)
+# The path is returned from start to goal, and is empty on failure.
+# Building the planner is timed separately, as setup_time.
+# With smooth=True it is passed through smooth_path, which is included in
+# the time.
+
+def solve(sspace, start, goal, planner_type=AStar, max_iter=None,
+          smooth=False, **kwargs):
+    t = time.perf_counter()
+    p = planner_type(sspace, **kwargs)
+    setup_time = time.perf_counter() - t
+    t = time.perf_counter()
+    p.start(start, goal)
+    p.step(max_iter)
+    return make_result(p, t, smooth, setup_time)
+
+# The result of a planner that has stopped, timed from start_time
+def make_result(p, start_time, smooth=False, setup_time=0.0):
+    sspace = p.sspace
+    if not p.complete:
+        t = time.perf_counter() - start_time
+        return PlanResult([], float("inf"), False, p.num_iter, t,
+            setup_time=setup_time)
+    path = p.path_nodes[::-1]
+    raw_path = path
+    if smooth:
+        path = smooth_path(sspace, path)
+    t = time.perf_counter() - start_time
+
+    return PlanResult(path, path_cost(sspace, path), True, p.num_iter, t,
+        path_length(sspace, path), path_length(sspace, raw_path), len(raw_path),
+        setup_time)
@@ -0,0 +1,45 @@
+import numpy as np
+
+from ._a_star import AStar, UNSEEN, CLOSED
+
+# Theta* (Nash et al.), an any-angle variant of A*. When a neighbour of the
+# expanded node can be seen from the node's parent, it is reached straight
+# from the parent instead, so parents can be any distance away and paths
+# are made of long straight lines between corners rather than a staircase
+# of grid moves. The lines from the parent to all the neighbours are
+# checked together with sspace.line_of_sight, and their costs come from
+# sspace.segments_cost, so they include costmap costs.
+#
+# path_nodes holds just the corners of the path, from goal to start.
+
+class ThetaStar(AStar):
+    def expand(self, current):
+        sspace = self.sspace
+        get_variable = sspace.get_variable
+        current_index = sspace.to_index(current)
+        current_g = get_variable("g", current)
+        edges = [(neighbour, cost) for neighbour, cost in sspace.edges(current)
+            if get_variable("checked", neighbour) != CLOSED]
+        if not edges:
+            return
+
+        parent_index = get_variable("parent", current)
+        if parent_index != current_index:
+            neighbours = np.array([sspace.decode(n) for n, _ in edges])
+            parent_node = sspace.to_node(parent_index)
+            visible = sspace.line_of_sight(parent_node, neighbours)
+            direct_g = get_variable("g", parent_index) + sspace.segments_cost(
+                np.broadcast_to(parent_node, neighbours.shape), neighbours)
+        else:
+            visible = np.zeros(len(edges), bool)
+
+        # The straight line from the parent is only shorter under uniform
+        # costs. With a costmap it can cross costly cells, so it is taken
+        # only when it is cheaper than going through the current node.
+        for k, (neighbour, cost) in enumerate(edges):
+            new_g, parent = current_g + cost, current_index
+            if visible[k] and direct_g[k] < new_g:
+                new_g, parent = direct_g[k], parent_index
+            if get_variable("checked", neighbour) == UNSEEN or \
+               new_g < get_variable("g", neighbour):
+                self.open_node(neighbour, new_g, parent)
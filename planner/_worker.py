@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+from ._a_star import AStar
+from ._solve import make_result
+
+# Runs a planner in a background thread, so a GUI or an asyncio service is
+# never blocked by the search. The search runs in steps of step_ms, and
+# between them the worker publishes a PlanSnapshot at most snapshot_hz
+# times a second, and once more when it stops. Readers take the latest
+# with snapshot(), which never waits on the search. Nothing in the worker
+# thread touches pygame, so the state space should not have drawing
+# observers (see GridRenderer with observe=False).
+#
+# For an incremental planner (eg: DStarLite), with repair=True the worker
+# keeps running once the search has finished, and waits for edits to the
+# map. Each edit wakes it to repair the plan and publish the result, until
+# it is cancelled. idle is set whenever the search has finished, and done
+# once the thread has exited.
+#
+# cancel() stops the search after the current step, and join() waits for
+# the thread to exit, eg:
+#   worker = PlanWorker(planner.AStar(sspace), start, goal)
+#   ...
+#   snapshot = worker.snapshot()
+#   ...
+#   worker.cancel()
+#   worker.join()
+#
+# From asyncio, plan() runs a search in a worker and awaits its result.
+
+# Progress of a search. explored holds the drawn variable of every cell
+# (eg: g for AStar), or None over a TiledMap, and path is the best path
+# so far, from goal to start.
+class PlanSnapshot:
+    def __init__(self, num_iter, explored, path, active, complete):
+        self.num_iter = num_iter
+        self.explored = explored
+        self.num_explored = None if explored is None else np.count_nonzero(explored)
+        self.path = path
+        self.active = active
+        self.complete = complete
+
+class PlanWorker:
+    # on_snapshot is called with each snapshot, and on_done when the thread
+    # is about to exit, both from the worker thread
+    def __init__(self, planner, start, goal, snapshot_hz=10, step_ms=5,
+                 on_snapshot=None, on_done=None, smooth=False, repair=True):
+        self.planner = planner
+        self.interval = 1/snapshot_hz
+        self.step_ms = step_ms
+        self.on_snapshot = on_snapshot
+        self.on_done = on_done
+        self.smooth = smooth
+        self.latest = None
+        self.error = None
+        self.start_time = None
+        self.repair = repair and planner.incremental
+        self.cancelled = threading.Event()
+        self.idle = threading.Event()
+        self.done = threading.Event()
+        # Set by edits to the map, and by cancel, while repairing
+        self.wake = threading.Event()
+        if self.repair:
+            planner.sspace.source.add_listener(self.map_changed)
+        self.thread = threading.Thread(
+            target=self.run, args=(start, goal), daemon=True)
+        self.thread.start()
+
+    def run(self, start, goal):
+        try:
+            self.start_time = time.perf_counter()
+            self.planner.start(start, goal)
+            self.search()
+            while self.repair and not self.cancelled.is_set():
+                self.wake.wait()
+                self.wake.clear()
+                if self.cancelled.is_set():
+                    break
+                self.idle.clear()
+                # The planner applies the edits on its next update
+                self.planner.update()
+                self.search()
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.repair:
+                self.planner.sspace.source.remove_listener(self.map_changed)
+            self.idle.set()
+            self.done.set()
+            if self.on_done is not None:
+                self.on_done()
+
+    def search(self):
+        self.publish()
+        next_snapshot = time.perf_counter() + self.interval
+        while self.planner.active and not self.cancelled.is_set():
+            self.planner.step(budget_ms=self.step_ms)
+            now = time.perf_counter()
+            if now >= next_snapshot:
+                self.publish()
+                next_snapshot = now + self.interval
+        self.publish()
+        self.idle.set()
+
+    # Called by the map on each edit, after the planner has recorded it
+    def map_changed(self, x0, y0, x1, y1):
+        self.wake.set()
+
+    def publish(self):
+        p = self.planner
+        sspace = p.sspace
+        explored = None
+        if sspace.draw_index is not None and not sspace.tiled:
+            explored = sspace.variable_array(sspace.draw_index)
+        self.latest = PlanSnapshot(p.num_iter, explored, list(p.best_path()),
+            p.active, p.complete)
+        if self.on_snapshot is not None:
+            self.on_snapshot(self.latest)
+
+    # The latest snapshot, or None before the first
+    def snapshot(self):
+        return self.latest
+
+    def cancel(self):
+        self.cancelled.set()
+        self.wake.set()
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+
+    # The PlanResult, once idle, as from solve. Raises any error from the
+    # search.
+    def result(self):
+        if not self.idle.is_set():
+            raise RuntimeError("The search is still running")
+        if self.error is not None:
+            raise self.error
+        return make_result(self.planner, self.start_time, self.smooth)
+
+
+# Plans in a PlanWorker and returns the PlanResult, without blocking the
+# event loop. on_progress is called on the event loop with each snapshot.
+# Cancelling the awaiting task cancels the search and waits for the worker
+# to exit before the CancelledError propagates. Any extra keyword
+# arguments are passed to the planner, as for solve.
+async def plan(sspace, start, goal, planner_type=AStar, on_progress=None,
+               snapshot_hz=10, smooth=False, **kwargs):
+    loop = asyncio.get_running_loop()
+    finished = loop.create_future()
+
+    def set_finished():
+        if not finished.done():
+            finished.set_result(None)
+
+    on_snapshot = None
+    if on_progress is not None:
+        on_snapshot = lambda snapshot: loop.call_soon_threadsafe(on_progress, snapshot)
+    worker = PlanWorker(planner_type(sspace, **kwargs), start, goal,
+        snapshot_hz, on_snapshot=on_snapshot,
+        on_done=lambda: loop.call_soon_threadsafe(set_finished), smooth=smooth,
+        repair=False)
+    try:
+        await finished
+    except asyncio.CancelledError:
+        worker.cancel()
+        await loop.run_in_executor(None, worker.join)
+        raise
+    return worker.result()
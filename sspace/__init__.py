@@ -1,2 +1,17 @@
 from ._occ_map import OccupancyMap, MazeGenerator
 from ._sspace import StateSpace, StateSpaceGrid
+from ._costmap import Costmap
+from ._graph import GridGraph
+from ._map_file import TiledMap, save_map, load_map
+from ._sampling import FreeCellIndex, UniformSampler, HaltonSampler, GoalBiasedSampler
+
+# GridDrawer and GridRenderer need pygame, so they are only imported when
+# first used
+def __getattr__(name):
+    if name == "GridDrawer":
+        from ._draw import GridDrawer
+        return GridDrawer
+    if name == "GridRenderer":
+        from ._draw import GridRenderer
+        return GridRenderer
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -0,0 +1,102 @@
+import math
+import threading
+import numpy as np
+
+from ._occ_map import map_ids
+
+# A costmap layer over an occupancy map, for a robot with a real radius.
+#
+# It keeps the Euclidean distance from every cell to the nearest occupied
+# cell, up to robot_radius + clearance (in cells). Cells within
+# robot_radius of an occupied cell are blocked, since the robot would
+# collide there, and cells within a further clearance have an extra cost,
+# falling linearly from clearance_weight next to the blocked cells to 0.
+# A StateSpaceGrid given the costmap treats blocked cells as occupied,
+# and multiplies the cost of moving into a cell by 1 + its extra cost.
+#
+# Since distances are only needed up to a fixed reach, an edit only
+# changes them within that reach of the edited rectangle. The costmap
+# listens for edits and recomputes just those regions, the next time it
+# is used. It can be shared by every state space built on the same map.
+
+# Euclidean distance from each cell to the nearest True cell of occupied,
+# or inf where that is further than max_distance.
+# Distances along each column are found with a running max/min of the
+# occupied rows, then combined across columns by checking every x offset
+# that can be within max_distance, so each pass is vectorised.
+def distance_transform(occupied, max_distance):
+    height = occupied.shape[1]
+    y = np.arange(height)
+    before = np.maximum.accumulate(np.where(occupied, y, -np.inf), axis=1)
+    after = np.minimum.accumulate(
+        np.where(occupied, y, np.inf)[:, ::-1], axis=1)[:, ::-1]
+    column = np.minimum(y - before, after - y)**2
+    dist2 = column.copy()
+    for dx in range(1, int(max_distance) + 1):
+        np.minimum(dist2[dx:], column[:-dx] + dx*dx, out=dist2[dx:])
+        np.minimum(dist2[:-dx], column[dx:] + dx*dx, out=dist2[:-dx])
+    distance = np.sqrt(dist2)
+    distance[distance > max_distance] = np.inf
+    return distance
+
+class Costmap:
+    def __init__(self, occ_map, robot_radius=0, clearance=0, clearance_weight=1):
+        # State spaces built with the costmap are keyed by its uid, since
+        # their contents depend on it as well as on the map
+        self.uid = next(map_ids)
+        self.source = occ_map
+        self.robot_radius = robot_radius
+        self.clearance = clearance
+        self.clearance_weight = clearance_weight
+        self.max_distance = robot_radius + clearance
+        # How far an edit can change distances
+        self.reach = int(math.ceil(self.max_distance))
+        self.distance = np.empty(occ_map.occ_map.shape, np.float32)
+        self.costs = np.empty(occ_map.occ_map.shape, np.float32)
+        # Edits can come from another thread than the one updating, eg:
+        # the GUI's while a PlanWorker plans
+        self.changes = []
+        self.changes_lock = threading.Lock()
+        self.compute(0, 0, *occ_map.occ_map.shape)
+        occ_map.add_listener(self.map_changed)
+
+    # Blocked cells, which a state space treats as occupied
+    @property
+    def blocked(self):
+        return np.isinf(self.costs)
+
+    # Recomputes the cells in [x0, x1) x [y0, y1), from the map within
+    # reach of them
+    def compute(self, x0, y0, x1, y1):
+        bx0, by0, bx1, by1 = self.source.clip(
+            x0 - self.reach, y0 - self.reach, x1 + self.reach, y1 + self.reach)
+        distance = distance_transform(
+            self.source.occ_map[bx0:bx1, by0:by1], self.max_distance)
+        distance = distance[x0-bx0:x1-bx0, y0-by0:y1-by0]
+        costs = np.zeros(distance.shape)
+        if self.clearance > 0:
+            near = distance < self.max_distance
+            costs[near] = self.clearance_weight* \
+                (self.max_distance - distance[near])/self.clearance
+        costs[distance <= self.robot_radius] = np.inf
+        self.distance[x0:x1, y0:y1] = distance
+        self.costs[x0:x1, y0:y1] = costs
+
+    # The rectangle of cells an edit of [x0, x1) x [y0, y1) can change
+    def affected_rect(self, x0, y0, x1, y1):
+        return self.source.clip(
+            x0 - self.reach, y0 - self.reach, x1 + self.reach, y1 + self.reach)
+
+    def map_changed(self, x0, y0, x1, y1):
+        with self.changes_lock:
+            self.changes.append((x0, y0, x1, y1))
+
+    # Applies the edits made since the last update
+    def update(self):
+        with self.changes_lock:
+            changes = self.changes
+            self.changes = []
+        for rect in changes:
+            rect = self.affected_rect(*rect)
+            if rect is not None:
+                self.compute(*rect)
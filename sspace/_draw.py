@@ -0,0 +1,184 @@
+import time
+import numpy as np
+import pygame as pg
+
+# Draws a StateSpaceGrid onto a pygame surface. It is attached to the
+# state space as an observer, and is the only part of the state space
+# that needs pygame.
+
+class GridDrawer:
+    def __init__(self, sspace, path_color=(255, 0, 255)):
+        self.sspace = sspace
+        self.resolution = sspace.resolution
+        self.path_color = path_color
+        self.path_nodes = []
+        self.surface = pg.Surface((
+            sspace.occ_map.shape[0]*self.resolution,
+            sspace.occ_map.shape[1]*self.resolution), pg.SRCALPHA)
+        sspace.add_observer(self)
+
+    def fill_node(self, node, color):
+        node = self.sspace.decode(node)
+        self.surface.fill(color,
+            (node[0]*self.resolution, node[1]*self.resolution,
+             self.resolution, self.resolution))
+
+    def variable_changed(self, node, value):
+        self.fill_node(node, self.sspace.draw_color)
+
+    def variables_reset(self):
+        self.surface.fill((0, 0, 0, 0))
+        self.path_nodes = []
+
+    def path_changed(self, nodes):
+        # Restore the cells under the previous path, since an incremental
+        # planner can replace its path
+        for node in self.path_nodes:
+            if self.sspace.get_variable(self.sspace.draw_index, node) != 0:
+                self.fill_node(node, self.sspace.draw_color)
+            else:
+                self.fill_node(node, (0, 0, 0, 0))
+        self.path_nodes = list(nodes)
+        for node in nodes:
+            self.fill_node(node, self.path_color)
+
+    def draw(self, surface, pos=(0, 0)):
+        surface.blit(self.surface, pos)
+
+
+# Draws a StateSpaceGrid like GridDrawer, but from the variable arrays
+# rather than one cell at a time, so planners are not slowed down by a
+# call for every cell they write. At most max_fps times a second, however
+# fast the planner runs, draw compares the drawn variable over the whole
+# grid with what was last rendered, in one vectorised pass, and renders
+# only the square tiles of tile_size cells that changed. The surface is
+# blitted every frame.
+#
+# Values are coloured through colormap, a list of colours spread evenly
+# from vmin to vmax, eg: [(0, 0, 255), (255, 0, 0)] for blue to red.
+# Cells whose value is 0 are left transparent. By default every other
+# value is drawn in the state space's draw_color.
+#
+# With observe=False, the renderer is not an observer of the state space
+# and draws whatever was last passed to show, eg: the snapshots of a
+# planner running in a PlanWorker, so it never reads the state space
+# while another thread writes to it.
+
+class GridRenderer:
+    def __init__(self, sspace, colormap=None, vmin=0, vmax=1,
+                 path_color=(255, 0, 255), tile_size=32, max_fps=30,
+                 observe=True):
+        self.sspace = sspace
+        self.resolution = sspace.resolution
+        self.colormap = colormap
+        self.vmin = vmin
+        self.vmax = vmax
+        self.tile_size = tile_size
+        self.interval = 1/max_fps
+        self.last_render = -np.inf
+        self.width, self.height = sspace.occ_map.shape
+        self.num_tiles_x = -(-self.width//tile_size)
+        self.num_tiles_y = -(-self.height//tile_size)
+        # Tiles to render whether or not their values changed, eg: under
+        # the path
+        self.dirty = np.zeros((self.num_tiles_x, self.num_tiles_y), bool)
+        # Values as last rendered, and the path
+        self.shown = np.zeros((self.width, self.height))
+        self.path_mask = np.zeros((self.width, self.height), bool)
+        self.surface = pg.Surface((
+            self.width*self.resolution,
+            self.height*self.resolution), pg.SRCALPHA)
+        self.path_pixel = self.pixel(path_color)
+        self.observe = observe
+        # Values and path from the last call to show
+        self.values = None
+        self.path = None
+        if observe:
+            sspace.add_observer(self)
+
+    def variables_reset(self):
+        self.path_mask[:] = False
+        self.dirty[:] = True
+
+    def mark_cells(self, cells):
+        self.dirty[cells[:, 0]//self.tile_size, cells[:, 1]//self.tile_size] = True
+
+    def path_changed(self, nodes):
+        self.mark_cells(np.argwhere(self.path_mask))
+        self.path_mask[:] = False
+        if len(nodes) > 0:
+            cells = np.array([self.sspace.decode(node) for node in nodes])
+            self.path_mask[cells[:, 0], cells[:, 1]] = True
+            self.mark_cells(cells)
+
+    # Splits a (width, height) array into (num_tiles_x, num_tiles_y,
+    # tile_size, tile_size) tiles, padding the last ones
+    def split_tiles(self, cells):
+        t = self.tile_size
+        padded = np.zeros((self.num_tiles_x*t, self.num_tiles_y*t), cells.dtype)
+        padded[:self.width, :self.height] = cells
+        return padded.reshape(
+            self.num_tiles_x, t, self.num_tiles_y, t).swapaxes(1, 2)
+
+    # Colours of the colour map, as pixel values of the surface
+    def lookup_table(self):
+        colormap = self.colormap
+        if colormap is None:
+            colormap = [self.sspace.draw_color]
+        return np.array([self.pixel(color) for color in colormap], np.uint32)
+
+    # The 32 bit pixel value of a colour, which map_rgb gives signed
+    def pixel(self, color):
+        return self.surface.map_rgb(pg.Color(color)) & 0xFFFFFFFF
+
+    # Shows the explored cells and path of a PlanSnapshot
+    def show(self, snapshot):
+        if snapshot is None:
+            return
+        if snapshot.explored is not None:
+            self.values = snapshot.explored
+        if snapshot.path is not self.path:
+            self.path = snapshot.path
+            self.path_changed(snapshot.path)
+
+    # Renders every changed tile now, whatever the refresh rate. The
+    # colours of all of them are found together, so only copying them to
+    # the surface is done tile by tile.
+    def render(self):
+        if self.observe:
+            if self.sspace.draw_index is None:
+                return
+            values = self.sspace.variable_array(self.sspace.draw_index)
+        else:
+            if self.values is None:
+                return
+            values = self.values
+        changed = self.split_tiles(values != self.shown)
+        dirty = self.dirty | changed.any(axis=3).any(axis=2)
+        self.dirty[:] = False
+        if not dirty.any():
+            return
+        self.shown[:] = values
+        tiles = self.split_tiles(values)[dirty]
+        lut = self.lookup_table()
+        i = (tiles - self.vmin)*((len(lut) - 1)/(self.vmax - self.vmin))
+        colors = lut[np.clip(np.rint(i), 0, len(lut) - 1).astype(int)]
+        colors[tiles == 0] = self.pixel((0, 0, 0, 0))
+        colors[self.split_tiles(self.path_mask)[dirty]] = self.path_pixel
+        res = self.resolution
+        colors = colors.repeat(res, axis=1).repeat(res, axis=2)
+        pixels = pg.surfarray.pixels2d(self.surface)
+        size = self.tile_size*res
+        for tile, (tx, ty) in zip(colors, np.argwhere(dirty)):
+            x0, y0 = tx*size, ty*size
+            x1 = min(x0 + size, pixels.shape[0])
+            y1 = min(y0 + size, pixels.shape[1])
+            pixels[x0:x1, y0:y1] = tile[:x1-x0, :y1-y0]
+        del pixels
+
+    def draw(self, surface, pos=(0, 0)):
+        now = time.perf_counter()
+        if now - self.last_render >= self.interval:
+            self.render()
+            self.last_render = now
+        surface.blit(self.surface, pos)
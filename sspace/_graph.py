@@ -0,0 +1,55 @@
+import numpy as np
+
+# A compiled form of the 8-connected grid graph, as a compressed sparse row
+# (CSR) adjacency over flat cell indices, i = x*height + y.
+# The neighbours of cell i are indices[indptr[i]:indptr[i+1]], with the
+# cost of each edge (1 or sqrt(2)) at the same position in costs.
+# As with StateSpaceGrid.neighbours, an edge exists to every free cell in
+# bounds, whether or not the source cell is free. Given cell_costs, the
+# cost of each edge is multiplied by 1 + the cost of the cell it enters.
+
+class GridGraph:
+    def __init__(self, occ_map, offsets, cell_costs=None):
+        width, height = occ_map.shape
+        free = occ_map == 0
+
+        # valid[x, y, k] is True if the k'th offset from (x, y) is free
+        valid = np.zeros((width, height, len(offsets)), bool)
+        for k, (dx, dy) in enumerate(offsets):
+            src_x = slice(max(0, -dx), width - max(0, dx))
+            src_y = slice(max(0, -dy), height - max(0, dy))
+            dst_x = slice(max(0, dx), width - max(0, -dx))
+            dst_y = slice(max(0, dy), height - max(0, -dy))
+            valid[src_x, src_y, k] = free[dst_x, dst_y]
+        valid = valid.reshape(width*height, len(offsets))
+
+        flat_offsets = np.array([dx*height + dy for dx, dy in offsets])
+        offset_costs = np.array([np.hypot(dx, dy) for dx, dy in offsets])
+        cells = np.arange(width*height)
+
+        self.shape = (width, height)
+        self.indptr = np.zeros(width*height + 1, np.int64)
+        np.cumsum(valid.sum(axis=1), out=self.indptr[1:])
+        self.indices = (cells[:, None] + flat_offsets)[valid].astype(np.int32)
+        self.costs = np.broadcast_to(offset_costs, valid.shape)[valid]
+        if cell_costs is not None:
+            self.costs = self.costs*(1 + cell_costs.reshape(-1)[self.indices])
+
+    # Wraps CSR arrays already built for a map, without copying them, eg:
+    # views of shared memory in a worker process
+    @classmethod
+    def from_arrays(cls, shape, indptr, indices, costs):
+        graph = cls.__new__(cls)
+        graph.shape = tuple(shape)
+        graph.indptr = indptr
+        graph.indices = indices
+        graph.costs = costs
+        return graph
+
+    def neighbours(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i+1]].tolist()
+
+    def edges(self, i):
+        a = self.indptr[i]
+        b = self.indptr[i+1]
+        return zip(self.indices[a:b].tolist(), self.costs[a:b].tolist())
@@ -0,0 +1,125 @@
+import struct
+import numpy as np
+
+from ._occ_map import map_ids
+
+# A binary format for large occupancy maps, which are loaded as a TiledMap
+# through np.memmap, so opening one is near instant and only the tiles
+# that are read are paged in from disk.
+#
+# The file is a 64 byte header, then the map in square tiles of
+# tile_size cells (a multiple of 8), each bit-packed to tile_size^2/8
+# bytes. Tile (tx, ty) holds cells [tx*tile_size, (tx+1)*tile_size) x
+# [ty*tile_size, (ty+1)*tile_size), and tiles are stored in x then y
+# order. Within a tile, each row of constant x is packed along y, with the
+# lowest y in the lowest bit. Cells past the edge of the map in the last
+# tiles are stored as occupied.
+
+MAGIC = b"OCCMAP\0\0"
+FORMAT_VERSION = 1
+# magic, format version, tile size, width, height, resolution
+HEADER = struct.Struct("<8sIIQQd")
+HEADER_SIZE = 64
+
+# Number of set bits in each byte
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], np.uint8)
+
+# Writes a map, given as an OccupancyMap or a (width, height) bool array,
+# such as a memmap of a map too large for memory. Tiles are written one
+# column of tiles at a time.
+def save_map(path, occ_map, tile_size=64, resolution=None):
+    if tile_size % 8 != 0:
+        raise ValueError("tile_size must be a multiple of 8")
+    if resolution is None:
+        resolution = getattr(occ_map, "resolution", 1)
+    cells = getattr(occ_map, "occ_map", occ_map)
+    width, height = cells.shape
+    num_x = -(-width//tile_size)
+    num_y = -(-height//tile_size)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, tile_size,
+            width, height, resolution).ljust(HEADER_SIZE, b"\0"))
+    tiles = np.memmap(path, np.uint8, "r+", HEADER_SIZE,
+        (num_x, num_y, tile_size, tile_size//8))
+    column = np.ones((tile_size, num_y*tile_size), bool)
+    for tx in range(num_x):
+        x0 = tx*tile_size
+        x1 = min(x0 + tile_size, width)
+        column[:] = True
+        column[:x1-x0, :height] = cells[x0:x1]
+        tiles[tx] = np.packbits(
+            column.reshape(tile_size, num_y, tile_size).swapaxes(0, 1),
+            axis=-1, bitorder="little")
+    tiles.flush()
+    del tiles
+
+def load_map(path):
+    return TiledMap(path)
+
+
+# A read-only occupancy map backed by a map file. It can be indexed like
+# the occ_map array of an OccupancyMap, with a cell, arrays of cells, or
+# slices, and gives True for occupied cells. StateSpaceGrid plans over it
+# directly, reading cells as the planner needs them.
+
+class TiledMap:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+        magic, version, tile_size, width, height, resolution = \
+            HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError("{} is not a map file".format(path))
+        if version != FORMAT_VERSION:
+            raise ValueError("Unsupported map file version: {}".format(version))
+        self.path = path
+        self.uid = next(map_ids)
+        # The map never changes
+        self.version = 0
+        self.tile_size = tile_size
+        self.width = width
+        self.height = height
+        self.resolution = resolution
+        self.shape = (width, height)
+        self.size = width*height
+        self.num_tiles_x = -(-width//tile_size)
+        self.num_tiles_y = -(-height//tile_size)
+        self.tiles = np.memmap(path, np.uint8, "r", HEADER_SIZE,
+            (self.num_tiles_x, self.num_tiles_y, tile_size, tile_size//8))
+
+    def __getitem__(self, index):
+        x, y = index
+        if isinstance(x, slice) or isinstance(y, slice):
+            x0, x1, _ = x.indices(self.width) if isinstance(x, slice) else (x, x+1, 1)
+            y0, y1, _ = y.indices(self.height) if isinstance(y, slice) else (y, y+1, 1)
+            cells = self.read(x0, y0, x1, y1)
+            return cells[0 if not isinstance(x, slice) else slice(None),
+                         0 if not isinstance(y, slice) else slice(None)]
+        t = self.tile_size
+        if isinstance(x, (int, np.integer)) and isinstance(y, (int, np.integer)):
+            x, y = int(x), int(y)
+            byte = self.tiles[x//t, y//t, x % t, (y % t) >> 3]
+            return bool((byte >> (y & 7)) & 1)
+        x = np.asarray(x)
+        y = np.asarray(y)
+        byte = self.tiles[x//t, y//t, x % t, (y % t) >> 3]
+        return ((byte >> (y & 7)) & 1).astype(bool)
+
+    # The cells of [x0, x1) x [y0, y1) as a bool array, unpacking only the
+    # tiles they lie in
+    def read(self, x0, y0, x1, y1):
+        t = self.tile_size
+        tx0, ty0 = x0//t, y0//t
+        tx1, ty1 = -(-x1//t), -(-y1//t)
+        bits = np.unpackbits(self.tiles[tx0:tx1, ty0:ty1], axis=-1,
+            bitorder="little")
+        cells = bits.swapaxes(1, 2).reshape((tx1 - tx0)*t, (ty1 - ty0)*t)
+        return cells[x0 - tx0*t:x1 - tx0*t, y0 - ty0*t:y1 - ty0*t].astype(bool)
+
+    # Number of free cells, reading the file one column of tiles at a time
+    def count_free(self):
+        occupied = 0
+        for column in self.tiles:
+            occupied += int(POPCOUNT[column].sum(dtype=np.int64))
+        padding = self.tiles.size*8 - self.size
+        return self.size - (occupied - padding)
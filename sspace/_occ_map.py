@@ -1,54 +1,168 @@
+import itertools
 import numpy as np
-import pygame as pg
 import random
-import math
+import time
+import weakref
+
+# The occupancy map is only drawn when given an occ_color. Without one no
+# surface is created and pygame is never imported, so maps can be built
+# and planned over on machines without a display.
+#
+# Regions are edited with set_rect, set_circle and set_mask, which each
+# write the array with one sliced assignment and then redraw only the
+# rectangle they touched.
+#
+# Every edit increments version, so anything derived from the map can be
+# cached against (uid, version) and recomputed once the map changes.
+# Listeners are also called with the rectangle [x0, x1) x [y0, y1) that
+# was edited, so they can update only that part. Bound methods are held
+# by weak reference, so a listening planner is not kept alive by the map.
+
+map_ids = itertools.count()
 
 class OccupancyMap:
-    def __init__(self, width, height, resolution, occ_color):
+    def __init__(self, width, height, resolution, occ_color=None):
+        self.uid = next(map_ids)
+        self.version = 0
+        self.listeners = []
         self.width = int(width/resolution)
         self.height = int(height/resolution)
         self.resolution = resolution
         self.occ_map = np.full((self.width, self.height), False)
-        self.surface = pg.Surface(
-            (self.width*resolution, self.height*resolution))
+        self.surface = None
+        if occ_color is not None:
+            import pygame as pg
+            self.surface = pg.Surface(
+                (self.width*resolution, self.height*resolution))
+            self.occ_rgb = np.array(pg.Color(occ_color)[:3])
+            self.free_rgb = np.array([255, 255, 255])
         self.occ_color = occ_color
         self.clear()
 
+    # Builds a map from a (width, height) bool array of occupied cells.
+    # With copy=False the array itself is used as the map, eg: a read-only
+    # view of shared memory, and an empty map is made first so no other
+    # grid is allocated. Such a map is not drawn.
+    @classmethod
+    def from_array(cls, occ_map, resolution=1, occ_color=None, copy=True):
+        width, height = occ_map.shape
+        if not copy:
+            result = cls(0, 0, resolution)
+            result.width, result.height = width, height
+            result.occ_map = occ_map
+            return result
+        result = cls(width*resolution, height*resolution, resolution, occ_color)
+        result.set_mask(0, 0, occ_map.astype(bool), True)
+        return result
+
+    def add_listener(self, callback):
+        if hasattr(callback, "__self__"):
+            self.listeners.append(weakref.WeakMethod(callback))
+        else:
+            self.listeners.append(lambda: callback)
+
+    def remove_listener(self, callback):
+        self.listeners = [
+            ref for ref in self.listeners if ref() not in (None, callback)]
+
+    def changed(self, x0, y0, x1, y1):
+        self.version += 1
+        for ref in list(self.listeners):
+            callback = ref()
+            if callback is None:
+                self.listeners.remove(ref)
+            else:
+                callback(x0, y0, x1, y1)
+
     def clear(self):
-        self.surface.fill("#FFFFFF")
+        if self.surface is not None:
+            self.surface.fill("#FFFFFF")
         self.occ_map = np.full((self.width, self.height), False)
+        self.changed(0, 0, self.width, self.height)
 
     def fill(self):
-        self.surface.fill(self.occ_color)
+        if self.surface is not None:
+            self.surface.fill(self.occ_color)
         self.occ_map = np.full((self.width, self.height), True)
+        self.changed(0, 0, self.width, self.height)
 
     def set(self, x, y, value):
         if x < 0 or x >= self.width or y < 0 or y >= self.height:
             return False
         self.occ_map[x, y] = value
-        if not value:
-            self.surface.fill("#FFFFFF",
-                (x*self.resolution, y*self.resolution,
-                 self.resolution, self.resolution))
-        else:
-            self.surface.fill(self.occ_color,
+        if self.surface is not None:
+            color = self.occ_color if value else "#FFFFFF"
+            self.surface.fill(color,
                 (x*self.resolution, y*self.resolution,
                  self.resolution, self.resolution))
+        self.changed(x, y, x+1, y+1)
+        return True
+
+    # Clips the rectangle [x0, x1) x [y0, y1) to the map.
+    # Returns None if nothing is left.
+    def clip(self, x0, y0, x1, y1):
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.width), min(y1, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        return x0, y0, x1, y1
+
+    def set_rect(self, x, y, w, h, value):
+        rect = self.clip(x, y, x+w, y+h)
+        if rect is None:
+            return False
+        x0, y0, x1, y1 = rect
+        self.occ_map[x0:x1, y0:y1] = value
+        if self.surface is not None:
+            color = self.occ_color if value else "#FFFFFF"
+            self.surface.fill(color,
+                (x0*self.resolution, y0*self.resolution,
+                 (x1-x0)*self.resolution, (y1-y0)*self.resolution))
+        self.changed(x0, y0, x1, y1)
+        return True
+
+    # Sets the cells where mask is True, with mask[0, 0] placed at (x, y)
+    def set_mask(self, x, y, mask, value):
+        rect = self.clip(x, y, x+mask.shape[0], y+mask.shape[1])
+        if rect is None:
+            return False
+        x0, y0, x1, y1 = rect
+        self.occ_map[x0:x1, y0:y1][mask[x0-x:x1-x, y0-y:y1-y]] = value
+        self.redraw(x0, y0, x1, y1)
+        self.changed(x0, y0, x1, y1)
         return True
 
     def set_circle(self, x, y, r, value):
-        for i in range(-r, r+1):
-            for j in range(-r, r+1):
-                if math.hypot(i, j) <= r:
-                    self.set(x+i, y+j, value)
+        i = np.arange(-r, r+1)
+        mask = np.hypot(i[:, None], i[None, :]) <= r
+        return self.set_mask(x-r, y-r, mask, value)
+
+    # Redraws the cells in [x0, x1) x [y0, y1) from the array
+    def redraw(self, x0, y0, x1, y1):
+        if self.surface is None:
+            return
+        import pygame as pg
+        res = self.resolution
+        cells = self.occ_map[x0:x1, y0:y1]
+        colors = np.where(cells[:, :, None], self.occ_rgb, self.free_rgb)
+        colors = colors.repeat(res, axis=0).repeat(res, axis=1)
+        pixels = pg.surfarray.pixels3d(self.surface)
+        pixels[x0*res:x1*res, y0*res:y1*res] = colors
+        del pixels
 
     def is_valid(self, node):
         return node[0] >= 0 and node[0] < self.width and \
                node[1] >= 0 and node[1] < self.height
 
 
+# Generates a maze over a grid of square cells of cell_size, with walls of
+# wall_width between them. update carves one cell at a time, so the maze
+# can be drawn as it grows, and generate builds the whole maze in one call
+# (see below). A seed makes either reproducible.
+
 class MazeGenerator:
-    def __init__(self, occ_map, cell_size, wall_width=2):
+    def __init__(self, occ_map, cell_size, wall_width=2, seed=None):
+        self.random = random.Random(seed)
         self.width = int(occ_map.width/cell_size)
         self.height = int(occ_map.height/cell_size)
 
@@ -71,37 +185,30 @@ class MazeGenerator:
         occ_map.fill()
 
     def fill_square(self, occ_map, node):
-        for i in range(self.wall_half, self.cell_size - self.wall_half):
-            for j in range(self.wall_half, self.cell_size - self.wall_half):
-                occ_map.set(
-                    self.cell_size*node[0] + i,
-                    self.cell_size*node[1] + j,
-                    False)
+        inner = self.cell_size - 2*self.wall_half
+        occ_map.set_rect(
+            self.cell_size*node[0] + self.wall_half,
+            self.cell_size*node[1] + self.wall_half,
+            inner, inner, False)
 
     def fill_gap(self, occ_map, node, disp):
         x, y = node
-        for k in range(self.wall_half, self.cell_size - self.wall_half):
-            for l in range(-self.wall_width, self.wall_width):
-                if (disp == [1, 0]).all():
-                    occ_map.set(
-                        (x+1)*self.cell_size + l,
-                        y*self.cell_size + k,
-                        False)
-                elif (disp == [-1, 0]).all():
-                    occ_map.set(
-                        x*self.cell_size + l,
-                        y*self.cell_size + k,
-                        False)
-                elif (disp == [0, 1]).all():
-                    occ_map.set(
-                        x*self.cell_size + k,
-                        (y+1)*self.cell_size + l,
-                        False)
-                elif (disp == [0, -1]).all():
-                    occ_map.set(
-                        x*self.cell_size + k,
-                        y*self.cell_size + l,
-                        False)
+        dx, dy = disp
+        inner = self.cell_size - 2*self.wall_half
+        gap = 2*self.wall_width
+        # The gap is centred on the wall between the two cells
+        if dx != 0:
+            wall_x = (x + max(dx, 0))*self.cell_size
+            occ_map.set_rect(
+                wall_x - self.wall_width,
+                y*self.cell_size + self.wall_half,
+                gap, inner, False)
+        else:
+            wall_y = (y + max(dy, 0))*self.cell_size
+            occ_map.set_rect(
+                x*self.cell_size + self.wall_half,
+                wall_y - self.wall_width,
+                inner, gap, False)
 
     def valid_node(self, node):
         if node[0] < 0 or node[0] >= self.width:
@@ -123,7 +230,7 @@ class MazeGenerator:
         valid_node = False
         indices = list(range(4))
         for i in range(3):
-            k = random.randint(0, 3-i)
+            k = self.random.randint(0, 3-i)
             end = indices[-1-i]
             indices[-1-i] = indices[k]
             indices[k] = end
@@ -137,3 +244,113 @@ class MazeGenerator:
                 break
         if not valid_node:
             self.nodes.pop()
+
+    # Runs up to n updates, or until budget_ms milliseconds have passed,
+    # as for Planner.step. With neither limit, generates the whole maze.
+    def step(self, occ_map, n=None, budget_ms=None):
+        deadline = None
+        if budget_ms is not None:
+            deadline = time.perf_counter() + budget_ms/1000
+        i = 0
+        while not self.complete and (n is None or i < n):
+            self.update(occ_map)
+            i += 1
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        return i
+
+    # Builds the whole maze at once. The maze is made on the cell graph,
+    # as whether the wall on the +x side (open_x) and the +y side (open_y)
+    # of each cell is open, and then drawn into the map with a few sliced
+    # writes, so a 10000x10000 map takes seconds. algorithm is one of:
+    #   "dfs": depth first search from cell (0, 0), as update carves, which
+    #     gives long winding corridors with exactly one route between any
+    #     two cells
+    #   "binary_tree": every cell opens its +x or +y wall at random, which
+    #     is fully vectorised and gives a more open layout, biased towards
+    #     straight runs along the far edges
+    # loops then opens that fraction of the walls still closed, adding
+    # loops, up to an open grid of rooms at loops=1.
+    def generate(self, occ_map, seed=None, algorithm="dfs", loops=0):
+        rng = np.random.default_rng(seed)
+        if algorithm == "dfs":
+            open_x, open_y = self.dfs(rng)
+        elif algorithm == "binary_tree":
+            open_x, open_y = self.binary_tree(rng)
+        else:
+            raise ValueError("Unknown maze algorithm: {}".format(algorithm))
+        if loops > 0:
+            open_x |= rng.random(open_x.shape) < loops
+            open_y |= rng.random(open_y.shape) < loops
+        self.draw(occ_map, open_x, open_y)
+        self.visited[:] = True
+        self.nodes = []
+        self.complete = True
+
+    # Iterative depth first search. Cells are flat indices into the grid
+    # padded by one visited cell on every side, so moves need no bounds
+    # checks. Each cell tries its 4 moves in an order drawn up front, one
+    # per visit to the top of the stack.
+    def dfs(self, rng):
+        h = self.height + 2
+        moves = (h, -h, 1, -1)
+        orders = list(itertools.permutations(range(4)))
+        order = rng.integers(0, len(orders), (self.width + 2)*h).tolist()
+        visited = np.ones((self.width + 2, h), np.uint8)
+        visited[1:-1, 1:-1] = 0
+        visited = bytearray(visited.tobytes())
+        tried = bytearray(len(visited))
+        carved = []
+        stack = [h + 1]
+        visited[h + 1] = 1
+        while stack:
+            cell = stack[-1]
+            k = tried[cell]
+            if k == 4:
+                stack.pop()
+                continue
+            tried[cell] = k + 1
+            move = orders[order[cell]][k]
+            next_cell = cell + moves[move]
+            if not visited[next_cell]:
+                visited[next_cell] = 1
+                carved.append(4*cell + move)
+                stack.append(next_cell)
+
+        carved = np.array(carved, dtype=np.int64)
+        x, y = np.divmod(carved//4, h)
+        x, y, move = x - 1, y - 1, carved % 4
+        open_x = np.zeros((self.width - 1, self.height), bool)
+        open_y = np.zeros((self.width, self.height - 1), bool)
+        open_x[x[move == 0], y[move == 0]] = True
+        open_x[x[move == 1] - 1, y[move == 1]] = True
+        open_y[x[move == 2], y[move == 2]] = True
+        open_y[x[move == 3], y[move == 3] - 1] = True
+        return open_x, open_y
+
+    def binary_tree(self, rng):
+        along_x = rng.random((self.width, self.height)) < 0.5
+        # Cells on the last column or row can only open the other way
+        along_x[-1, :] = False
+        along_x[:, -1] = True
+        along_x[-1, -1] = False
+        return along_x[:-1, :], ~along_x[:, :-1]
+
+    # Draws the cells and the open walls between them, with the same
+    # shapes as fill_square and fill_gap
+    def draw(self, occ_map, open_x, open_y):
+        s, w = self.cell_size, self.wall_width
+        a, b = self.wall_half, self.cell_size - self.wall_half
+        occupied = np.ones((occ_map.width, occ_map.height), bool)
+        # Cell x, y spans cells[x, :, y, :]
+        cells = occupied[:self.width*s, :self.height*s].reshape(
+            self.width, s, self.height, s)
+        cells[:, a:b, :, a:b] = False
+        closed_x = ~open_x[:, None, :, None]
+        closed_y = ~open_y[:, None, :, None]
+        cells[:-1, s-w:, :, a:b] &= closed_x
+        cells[1:, :w, :, a:b] &= closed_x
+        cells[:, a:b, :-1, s-w:] &= closed_y
+        cells[:, a:b, 1:, :w] &= closed_y
+        occ_map.fill()
+        occ_map.set_mask(0, 0, ~occupied, False)
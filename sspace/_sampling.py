@@ -0,0 +1,124 @@
+import numpy as np
+
+# The free cells of a map, as flat indices (x*height + y), kept up to date
+# as the map is edited, so free cells can be drawn uniformly in O(1).
+#
+# cells[:count] holds the free cells in no particular order, and position
+# gives where each cell is in it, or -1 if it is occupied. A cell that
+# becomes occupied is swap-removed: the last free cell is moved into its
+# slot. Edits are applied a rectangle at a time, with all the swaps of a
+# rectangle done together.
+
+class FreeCellIndex:
+    def __init__(self, free):
+        free = free.reshape(-1)
+        dtype = np.int32 if free.size < 2**31 else np.int64
+        free_cells = np.flatnonzero(free)
+        self.count = len(free_cells)
+        self.cells = np.empty(free.size, dtype)
+        self.cells[:self.count] = free_cells
+        self.position = np.full(free.size, -1, dtype)
+        self.position[free_cells] = np.arange(self.count)
+
+    def __len__(self):
+        return self.count
+
+    # Draws n free cells, given integers(high, size=n) giving n random
+    # integers in [0, high), eg: np.random.randint or Generator.integers
+    def sample(self, n, integers):
+        return self.cells[integers(self.count, size=n)]
+
+    def add(self, cells):
+        end = self.count + len(cells)
+        self.cells[self.count:end] = cells
+        self.position[cells] = np.arange(self.count, end)
+        self.count = end
+
+    # Removes free cells, moving the cells from the end of cells[:count]
+    # that are not removed into the slots of the removed ones
+    def remove(self, cells):
+        k = len(cells)
+        if k == 0:
+            return
+        end = self.count - k
+        positions = self.position[cells]
+        self.position[cells] = -1
+        tail = self.cells[end:self.count]
+        moved = tail[self.position[tail] >= 0]
+        holes = np.sort(positions[positions < end])
+        self.cells[holes] = moved
+        self.position[moved] = holes
+        self.count = end
+
+    # Updates the cells of [x0, x1) x [y0, y1) from free, a bool array of
+    # them, for a map of the given height
+    def update(self, x0, y0, x1, y1, free, height):
+        cells = (np.arange(x0, x1)[:, None]*height + np.arange(y0, y1)).reshape(-1)
+        free = free.reshape(-1)
+        indexed = self.position[cells] >= 0
+        self.remove(cells[indexed & ~free])
+        self.add(cells[free & ~indexed])
+
+
+# Samplers draw free cells for a StateSpaceGrid, which uses one for
+# random_node and random_nodes if it is given one, eg:
+#   sspace.sampler = GoalBiasedSampler(goal, 0.05, seed=1)
+# Each takes a seed, so a run can be reproduced. sample returns an (n, 2)
+# array of nodes.
+
+class UniformSampler:
+    def __init__(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+
+    def sample(self, sspace, n):
+        return sspace.sample_free(n, self.rng.integers)
+
+# Radical inverse of each integer of i in base, the van der Corput sequence
+def radical_inverse(i, base):
+    i = np.array(i)
+    result = np.zeros(i.shape)
+    f = 1/base
+    while (i > 0).any():
+        result += f*(i % base)
+        i //= base
+        f /= base
+    return result
+
+# Low-discrepancy samples from the 2D Halton sequence (bases 2 and 3) over
+# the map, which cover it more evenly than uniform samples. Points in
+# occupied cells are skipped. The seed gives a random shift of the whole
+# sequence (a Cranley-Patterson rotation).
+class HaltonSampler:
+    def __init__(self, seed=None):
+        self.shift = np.random.default_rng(seed).random(2)
+        self.i = 1
+
+    def sample(self, sspace, n):
+        width, height = sspace.occ_map.shape
+        nodes = np.empty((0, 2), int)
+        while len(nodes) < n:
+            i = np.arange(self.i, self.i + 2*(n - len(nodes)))
+            points = (np.stack([radical_inverse(i, 2), radical_inverse(i, 3)],
+                axis=1) + self.shift) % 1
+            cells = (points*[width, height]).astype(int)
+            free = np.flatnonzero(sspace.occ_map[cells[:, 0], cells[:, 1]] == 0)
+            free = free[:n - len(nodes)]
+            nodes = np.concatenate((nodes, cells[free]))
+            # Continue the sequence after the last point used
+            self.i = i[free[-1]] + 1 if len(free) > 0 else i[-1] + 1
+        return nodes
+
+# Draws the goal with probability bias, and otherwise from sampler, which
+# is a UniformSampler seeded from seed by default
+class GoalBiasedSampler:
+    def __init__(self, goal, bias=0.05, seed=None, sampler=None):
+        self.goal = np.asarray(goal)
+        self.bias = bias
+        bias_seed, sampler_seed = np.random.SeedSequence(seed).spawn(2)
+        self.rng = np.random.default_rng(bias_seed)
+        self.sampler = UniformSampler(sampler_seed) if sampler is None else sampler
+
+    def sample(self, sspace, n):
+        nodes = self.sampler.sample(sspace, n)
+        nodes[self.rng.random(n) < self.bias] = self.goal
+        return nodes
@@ -1,10 +1,18 @@
+import array
+import math
 import numpy as np
-import pygame as pg
+
+from ._graph import GridGraph
+from ._map_file import TiledMap
+from ._sampling import FreeCellIndex
 
 # This is an abstract base class for a type of state space.
 # A state space is a graph, with a given distance metric between nodes.
 # Each node can hold a given variable, and drawing can be setup for this
-# variable, using a pygame surface
+# variable. Drawing is done by observers (see GridDrawer and GridRenderer),
+# which are told when the path changes and, if they ask, when the drawn
+# variable of a cell (by flat index) changes, so the state space itself
+# never needs pygame.
 
 class StateSpace:
     def neighbours(self):
@@ -31,68 +39,372 @@ class StateSpace:
 # A 2D grid is the simplest type of state space.
 # It is defined by an occupancy map, where each cell is connected to its
 # 8 neighbours unless the neighbour cell is occupied.
+#
+# Nodes are normally (x, y) arrays. With compiled=True the adjacency is
+# built once as a GridGraph, and nodes can also be given as flat cell
+# indices (x*height + y), which avoids allocating small arrays in the
+# search. Planners convert their start and goal with encode, which gives
+# flat indices when compiled, and convert back with decode.
+#
+# The occupancy map can also be a TiledMap loaded from a map file, which
+# is read cell by cell as the search needs it rather than copied, and
+# variables are then kept only for the cells that are written. Planners
+# that precompute over the whole grid (the compiled graph, JPS, HPA*,
+# D* Lite, costmaps) need an OccupancyMap, which can be made for a region
+# of the file with TiledMap.read.
+
+# A dict standing in for a variable array, where unwritten cells read as
+# 0. Values are kept as Python numbers, so are not rounded to the typecode.
+class SparseArray(dict):
+    def __init__(self, typecode):
+        super().__init__()
+        self.typecode = typecode
+
+    def __missing__(self, i):
+        return 0
 
 class StateSpaceGrid(StateSpace):
-    def __init__(self, occ_map):
-        self.occ_map = occ_map.occ_map.astype(int)
+    def __init__(self, occ_map, compiled=False, costmap=None, sampler=None):
+        self.source = occ_map
+        # With a Costmap, cells it blocks are occupied, and moving into a
+        # cell costs 1 + its extra cost times the distance
+        self.costmap = costmap
+        self.cell_costs = None
+        self.tiled = isinstance(occ_map, TiledMap)
+        if self.tiled:
+            if compiled or costmap is not None:
+                raise ValueError("A TiledMap can not be compiled or have a costmap")
+            self.occ_map = occ_map
+            self.map_key = (occ_map.uid, occ_map.version)
+        elif costmap is None:
+            self.occ_map = occ_map.occ_map.astype(int)
+            # Identifies the map contents this state space was built from
+            self.map_key = (occ_map.uid, occ_map.version)
+        else:
+            costmap.update()
+            self.occ_map = costmap.blocked.astype(int)
+            self.cell_costs = np.where(self.occ_map == 0, costmap.costs, 0)
+            self.map_key = (costmap.uid, occ_map.version)
+        self.setup_grid(compiled, sampler)
+
+    # Builds a state space over arrays that already exist, without copying
+    # them, eg: read-only views of shared memory in a worker process (see
+    # solve_batch). occ_map is an OccupancyMap whose grid is planned on
+    # directly, cell_costs the extra cost of each cell, if any, and graph
+    # a GridGraph over them, if compiled. The arrays can't be refreshed,
+    # so the map must not be edited.
+    @classmethod
+    def from_arrays(cls, occ_map, cell_costs=None, graph=None, sampler=None):
+        sspace = cls.__new__(cls)
+        sspace.source = occ_map
+        sspace.costmap = None
+        sspace.cell_costs = cell_costs
+        sspace.tiled = False
+        sspace.occ_map = occ_map.occ_map
+        sspace.map_key = (occ_map.uid, occ_map.version)
+        sspace.setup_grid(graph is not None, sampler, graph)
+        return sspace
+
+    def setup_grid(self, compiled, sampler, graph=None):
         self.offsets = [np.array([x, y])
             for x in range(-1, 2) for y in range(-1, 2) if x!=0 or y!=0]
-        self.resolution = occ_map.resolution
-        self.surface = pg.Surface((
-            self.occ_map.shape[0]*self.resolution,
-            self.occ_map.shape[1]*self.resolution), pg.SRCALPHA)
+        self.resolution = self.source.resolution
+        self.height = self.occ_map.shape[1]
+        self.compiled = compiled
+        self.graph = graph
+        if compiled and graph is None:
+            self.graph = GridGraph(self.occ_map, self.offsets, self.cell_costs)
+        self.free_index = None
+        # Draws random nodes if set (see UniformSampler)
+        self.sampler = sampler
+        self.variables = None
+        self.observers = []
+        self.cell_observers = []
+        self.draw_index = None
+        self.draw_color = (0, 255, 255)
+
+    # Observers without a variable_changed method find changed cells from
+    # the variable arrays themselves, and are not told about each write
+    def add_observer(self, observer):
+        self.observers.append(observer)
+        if hasattr(observer, "variable_changed"):
+            self.cell_observers.append(observer)
 
     def _valid_state(self, node):
         if node[0] < 0 or node[0] >= self.occ_map.shape[0]: return False
         if node[1] < 0 or node[1] >= self.occ_map.shape[1]: return False
         return self.occ_map[tuple(node)] == 0
 
+    def to_index(self, node):
+        if isinstance(node, (int, np.integer)):
+            return int(node)
+        return int(node[0])*self.height + int(node[1])
+
+    def to_node(self, index):
+        return np.array(divmod(index, self.height))
+
+    # Copies a region of the source occupancy map after it was edited.
+    # The compiled graph is rebuilt when next used. With a costmap, an
+    # edit changes cells around the region too, so returns the rectangle
+    # that was updated.
+    def refresh(self, x0, y0, x1, y1):
+        if self.costmap is None:
+            self.occ_map[x0:x1, y0:y1] = self.source.occ_map[x0:x1, y0:y1]
+            self.map_key = (self.source.uid, self.source.version)
+        else:
+            self.costmap.update()
+            x0, y0, x1, y1 = self.costmap.affected_rect(x0, y0, x1, y1)
+            blocked = self.costmap.blocked[x0:x1, y0:y1]
+            self.occ_map[x0:x1, y0:y1] = blocked
+            self.cell_costs[x0:x1, y0:y1] = np.where(
+                blocked, 0, self.costmap.costs[x0:x1, y0:y1])
+            self.map_key = (self.costmap.uid, self.source.version)
+        self.graph = None
+        if self.free_index is not None:
+            self.free_index.update(x0, y0, x1, y1,
+                self.occ_map[x0:x1, y0:y1] == 0, self.height)
+        return x0, y0, x1, y1
+
+    # Refreshes the whole state space if the source map has been edited
+    # since it was built or last refreshed, eg: through set_rect by code
+    # that doesn't call refresh itself. Returns map_key.
+    def sync(self):
+        if self.map_key[1] != self.source.version:
+            self.refresh(0, 0, *self.occ_map.shape)
+        return self.map_key
+
+    # The compiled graph. If the state space was not created with
+    # compiled=True it is built on first use, but nodes stay as arrays.
+    def get_graph(self):
+        if self.graph is None:
+            self.graph = GridGraph(self.occ_map, self.offsets, self.cell_costs)
+        return self.graph
+
+    def encode(self, node):
+        if not self.compiled:
+            return node
+        return self.to_index(node)
+
+    def decode(self, node):
+        if isinstance(node, (int, np.integer)):
+            return self.to_node(node)
+        return node
+
     def neighbours(self, node):
+        if isinstance(node, int):
+            return self.get_graph().neighbours(node)
         return [node + offset for offset in self.offsets if self._valid_state(node+offset)]
 
+    # Yields (neighbour, cost) pairs
+    def edges(self, node):
+        if isinstance(node, int):
+            return self.get_graph().edges(node)
+        if self.cell_costs is None:
+            return [(neighbour, self.distance(node, neighbour))
+                for neighbour in self.neighbours(node)]
+        return [(neighbour, self.distance(node, neighbour)*
+            (1 + self.cell_costs[tuple(neighbour)]))
+            for neighbour in self.neighbours(node)]
+
     def distance(self, node1, node2):
-        return np.hypot(*(node1 - node2))
+        if isinstance(node1, int) and isinstance(node2, int):
+            x1, y1 = divmod(node1, self.height)
+            x2, y2 = divmod(node2, self.height)
+            return math.hypot(x1 - x2, y1 - y2)
+        return np.hypot(*(self.decode(node1) - self.decode(node2)))
 
     def same_node(self, node1, node2):
-        return (node1 == node2).all()
+        if isinstance(node1, int) and isinstance(node2, int):
+            return node1 == node2
+        return (self.decode(node1) == self.decode(node2)).all()
+
+    # Index of the free cells, built on first use and then kept up to date
+    # by refresh
+    def get_free_index(self):
+        if self.free_index is None:
+            self.free_index = FreeCellIndex(self.occ_map == 0)
+        return self.free_index
+
+    # Number of free cells
+    def num_free(self):
+        if self.tiled:
+            return self.occ_map.count_free()
+        return len(self.get_free_index())
 
     def random_node(self):
-        C_free = False
-        node = None
-        while not C_free:
-            node = np.random.randint(self.occ_map.shape)
-            if self._valid_state(node):
-                C_free = True
-        return node
+        return self.random_nodes(1)[0]
 
-    def create_variables(self, indexes):
-        self.variables = {
-            index: np.zeros(self.occ_map.shape)
-            for index in indexes }
+    # Draws n free cells, as an (n, 2) array, from the sampler if there is
+    # one, and otherwise uniformly from the global numpy generator
+    def random_nodes(self, n):
+        if self.sampler is not None:
+            return self.sampler.sample(self, n)
+        return self.sample_free(n, np.random.randint)
+
+    # Draws n free cells uniformly, given integers(high, size=n) (see
+    # FreeCellIndex.sample). A TiledMap is sampled by rejection, since its
+    # free cells are never listed.
+    def sample_free(self, n, integers):
+        if self.tiled:
+            nodes = np.empty((0, 2), int)
+            while len(nodes) < n:
+                cells = np.stack([integers(size, size=2*n)
+                    for size in self.occ_map.shape], axis=1)
+                free = ~self.occ_map[cells[:, 0], cells[:, 1]]
+                nodes = np.concatenate((nodes, cells[free]))
+            return nodes[:n]
+        cells = self.get_free_index().sample(n, integers)
+        return np.stack(np.divmod(cells, self.height), axis=1)
+
+    # Rasterises the straight lines from starts[i] to ends[i], for (n, 2)
+    # arrays of nodes, by stepping one cell at a time along the longer
+    # axis of each line (DDA). This gives a chain of 8-connected cells, so
+    # a free line is also a valid path on the grid. All lines are stepped
+    # together, padded to the longest one. Returns the (n, steps+1) cell
+    # coordinates, whether each step is part of its line, and the number
+    # of steps of each line.
+    def segment_cells(self, starts, ends):
+        starts = np.asarray(starts)
+        ends = np.asarray(ends)
+        delta = ends - starts
+        steps = np.abs(delta).max(axis=1)
+        t = np.arange(steps.max(initial=0) + 1)
+        fraction = t[None, :]/np.maximum(steps, 1)[:, None]
+        in_segment = t[None, :] <= steps[:, None]
+        points = np.rint(
+            starts[:, None, :] + fraction[:, :, None]*delta[:, None, :]).astype(int)
+        return points[..., 0], points[..., 1], in_segment, steps
+
+    # Checks each line against the map
+    def segments_free(self, starts, ends):
+        x, y, in_segment, _ = self.segment_cells(starts, ends)
+        width, height = self.occ_map.shape
+        in_bounds = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        occupied = np.ones(x.shape, bool)
+        occupied[in_bounds] = self.occ_map[x[in_bounds], y[in_bounds]] != 0
+        return ~(occupied & in_segment).any(axis=1)
+
+    # Cost of each line. Each step costs its length, times 1 + the extra
+    # cost of the cell it enters when there is a costmap, which matches
+    # the edge costs for lines between neighbouring cells.
+    def segments_cost(self, starts, ends):
+        starts = np.asarray(starts)
+        ends = np.asarray(ends)
+        length = np.hypot(*(ends - starts).T)
+        if self.cell_costs is None:
+            return length
+        x, y, in_segment, steps = self.segment_cells(starts, ends)
+        in_segment[:, 0] = False
+        width, height = self.occ_map.shape
+        x = np.clip(x, 0, width - 1)
+        y = np.clip(y, 0, height - 1)
+        extra = np.where(in_segment, self.cell_costs[x, y], 0).sum(axis=1)
+        return length*(1 + extra/np.maximum(steps, 1))
+
+    def segment_free(self, start, end):
+        return self.segments_free([start], [end])[0]
+
+    # Which of nodes have a free line from node, checked in one batch. This
+    # is the line-of-sight test of Theta* and of path smoothing.
+    def line_of_sight(self, node, nodes):
+        ends = np.array([self.decode(n) for n in nodes]).reshape(-1, 2)
+        return self.segments_free(
+            np.broadcast_to(self.decode(node), ends.shape), ends)
+
+    # Variables are stored per cell, in flat typed arrays, eg:
+    #   create_variables({"g": np.float32, "parent": np.int32, "closed": bool})
+    # A list of names creates float32 variables. The arrays are from the
+    # array module rather than numpy, since reading and writing single
+    # items of them from Python is much faster, and they are as compact.
+    #
+    # Every cell also has a generation stamp, and a cell stamped before the
+    # current generation reads as 0 for every variable, so reset_variables
+    # only has to start a new generation. Creating the same variables
+    # again reuses the arrays, so planners can be made for many queries
+    # on a state space without allocating.
+    #
+    # Over a TiledMap, the arrays are SparseArrays, and reset_variables
+    # clears them.
+    def create_variables(self, variables):
+        if not isinstance(variables, dict):
+            variables = {name: np.float32 for name in variables}
+        typecodes = {name: "B" if np.dtype(dtype) == bool else np.dtype(dtype).char
+            for name, dtype in variables.items()}
+        if self.variables is not None and typecodes == \
+           {name: arr.typecode for name, arr in self.variables.items()}:
+            self.reset_variables()
+            return
+        if self.tiled:
+            self.variables = {name: SparseArray(typecode)
+                for name, typecode in typecodes.items()}
+            self.stamps = SparseArray("H")
+            self.generation = 1
+            return
+        size = self.occ_map.size
+        self.variables = {name: array.array(typecode, [0])*size
+            for name, typecode in typecodes.items()}
+        self.stamps = array.array("H", [0])*size
+        self.generation = 1
 
     def reset_variables(self):
-        for arr in self.variables.values():
-            arr = np.zeros(arr.shape)
+        if self.tiled:
+            for arr in self.variables.values():
+                arr.clear()
+            self.stamps.clear()
+            for observer in self.observers:
+                observer.variables_reset()
+            return
+        self.generation += 1
+        # Stamps are cleared only when the generation wraps around
+        if self.generation == 2**16:
+            self.stamps = array.array("H", [0])*len(self.stamps)
+            self.generation = 1
+        for observer in self.observers:
+            observer.variables_reset()
 
     def get_variable(self, index, node):
-        return self.variables[index][tuple(node)]
+        i = node if isinstance(node, int) else self.to_index(node)
+        if self.stamps[i] != self.generation:
+            return 0
+        return self.variables[index][i]
 
     def set_variable(self, index, node, value):
-        self.variables[index][tuple(node)] = value
+        i = node if isinstance(node, int) else self.to_index(node)
+        if self.stamps[i] != self.generation:
+            self.stamps[i] = self.generation
+            for arr in self.variables.values():
+                arr[i] = 0
+        self.variables[index][i] = value
         if index == self.draw_index:
-            self.surface.fill((0, 255, 255),
-                (node[0]*self.resolution, node[1]*self.resolution,
-                 self.resolution, self.resolution))
+            for observer in self.cell_observers:
+                observer.variable_changed(i, value)
+
+    # Values of a variable over the cells of rect, [x0, x1) x [y0, y1), or
+    # over the whole grid, as a numpy array, eg: for drawing
+    def variable_array(self, index, rect=None):
+        shape = self.occ_map.shape
+        x0, y0, x1, y1 = rect if rect is not None else (0, 0) + shape
+        arr = self.variables[index]
+        if self.tiled:
+            values = np.zeros((x1 - x0, y1 - y0), np.dtype(arr.typecode))
+            for i, value in arr.items():
+                x, y = divmod(i, self.height)
+                if x0 <= x < x1 and y0 <= y < y1:
+                    values[x - x0, y - y0] = value
+            return values
+        values = np.frombuffer(arr, np.dtype(arr.typecode)).reshape(shape)
+        stamps = np.frombuffer(self.stamps, np.uint16).reshape(shape)
+        return np.where(stamps[x0:x1, y0:y1] == self.generation,
+            values[x0:x1, y0:y1], 0)
 
     def setup_drawing(self, index, color=(0, 255, 255)):
         self.draw_index = index
         self.draw_color = color
 
     def draw(self, surface, pos=(0, 0)):
-        surface.blit(self.surface, pos)
+        for observer in self.observers:
+            observer.draw(surface, pos)
 
     def draw_path(self, nodes):
-        for node in nodes:
-            self.surface.fill((255, 0, 255),
-                (node[0]*self.resolution, node[1]*self.resolution,
-                self.resolution, self.resolution))
+        for observer in self.observers:
+            observer.path_changed(nodes)
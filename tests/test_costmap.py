@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from sspace import OccupancyMap, StateSpaceGrid, Costmap
+import planner
+
+# Planners over a costmap should find paths as cheap as AStar's, since
+# edges into a cell are charged its cost
+
+def costmap_queries(seed):
+    rng = np.random.default_rng(seed)
+    occ_map = OccupancyMap(120, 90, 1)
+    for _ in range(12):
+        x, y = rng.integers(0, 110), rng.integers(0, 80)
+        occ_map.set_rect(x, y, x + rng.integers(2, 12), y + rng.integers(2, 12), True)
+    costmap = Costmap(occ_map, robot_radius=1, clearance=6, clearance_weight=3)
+    sspace = StateSpaceGrid(occ_map, compiled=True, costmap=costmap)
+    free = np.argwhere(sspace.occ_map == 0)
+    queries = [free[rng.integers(len(free), size=2)] for _ in range(5)]
+    return sspace, queries
+
+@pytest.mark.parametrize("seed", range(4))
+def test_cost_to_go_matches_a_star(seed):
+    sspace, queries = costmap_queries(seed)
+    cache = planner.CostToGoCache()
+    for start, goal in queries:
+        expected = planner.solve(sspace, start, goal, planner.AStar)
+        result = planner.solve(sspace, start, goal, planner.CostToGo, cache=cache)
+        assert result.success == expected.success
+        if expected.success:
+            assert result.cost == pytest.approx(expected.cost)
+
+# Theta* paths can cut corners, so are at most as costly as AStar's
+@pytest.mark.parametrize("seed", range(4))
+def test_theta_star_no_worse_than_a_star(seed):
+    sspace, queries = costmap_queries(seed)
+    for start, goal in queries:
+        expected = planner.solve(sspace, start, goal, planner.AStar)
+        result = planner.solve(sspace, start, goal, planner.ThetaStar)
+        assert result.success == expected.success
+        if expected.success:
+            assert result.cost <= expected.cost + 1e-6